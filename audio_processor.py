@@ -0,0 +1,191 @@
+# audio_processor.py
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+LOUDNESS_ENABLED = os.getenv("LOUDNESS_ENABLED", "1") == "1"
+LOUDNESS_WORKERS = int(os.getenv("LOUDNESS_WORKERS", 2))
+LOUDNESS_MAX_PENDING = 100
+ANALYSIS_TIMEOUT = 180
+# EBU R128 integrated loudness every track is brought to (LUFS), the true
+# peak it may not exceed after the gain (dBTP), and how far a track is moved.
+TARGET_LOUDNESS = float(os.getenv("TARGET_LOUDNESS", -14))
+TRUE_PEAK_LIMIT = -1.0
+MAX_BOOST = 10.0
+MAX_CUT = 15.0
+DEFAULT_VOLUME = 100
+MIN_VOLUME = 10
+MAX_VOLUME = 200
+
+FFMPEG_ANALYZE = ["-vn", "-af", f"loudnorm=I={TARGET_LOUDNESS}:TP={TRUE_PEAK_LIMIT}:print_format=json", "-f", "null", "-"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS loudness (
+    video_id TEXT PRIMARY KEY,
+    integrated REAL NOT NULL,
+    true_peak REAL NOT NULL,
+    gain REAL NOT NULL,
+    analyzed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chat_volume (
+    chat_id INTEGER PRIMARY KEY,
+    volume INTEGER NOT NULL
+);
+"""
+
+
+def track_gain(integrated, true_peak):
+    # dB that bring the track to TARGET_LOUDNESS; a boost is capped so the
+    # loudest peak stays under TRUE_PEAK_LIMIT instead of clipping.
+    gain = max(-MAX_CUT, min(MAX_BOOST, TARGET_LOUDNESS - integrated))
+    if gain > 0:
+        gain = max(0.0, min(gain, TRUE_PEAK_LIMIT - true_peak))
+    return round(gain, 2)
+
+
+def parse_loudnorm(output):
+    # loudnorm prints its measurements as the last JSON object on stderr.
+    start = output.rfind("{")
+    if start < 0:
+        raise ValueError("no loudnorm measurements in ffmpeg output")
+    data = json.loads(output[start:output.index("}", start) + 1])
+    integrated, true_peak = float(data["input_i"]), float(data["input_tp"])
+    if not (math.isfinite(integrated) and math.isfinite(true_peak)):
+        raise ValueError("track is silent")
+    return integrated, true_peak
+
+
+class AudioProcessor:
+    # The audio stage between a track's source and the voice call. Every
+    # video is measured once (EBU R128 via ffmpeg's loudnorm) by a small pool
+    # of background workers and its gain kept in SQLite; the ffmpeg inside
+    # AudioPiped then applies that gain plus the chat's volume with a single
+    # `volume` filter. Analysis is queued, never awaited: a track plays
+    # unadjusted until its gain is known.
+
+    def __init__(self, storage, workers=LOUDNESS_WORKERS, enabled=LOUDNESS_ENABLED):
+        self.storage = storage
+        self.workers = workers
+        self.enabled = enabled
+        self.gains = {}
+        self.volumes = {}
+        self.jobs = asyncio.Queue(maxsize=LOUDNESS_MAX_PENDING)
+        self.pending = set()
+        self.failed = set()
+        self.tasks = []
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self):
+        await self.storage.executescript(SCHEMA)
+        self.gains = dict(await self.storage.fetchall("SELECT video_id, gain FROM loudness"))
+        self.volumes = dict(await self.storage.fetchall("SELECT chat_id, volume FROM chat_volume"))
+        if self.enabled and not self.tasks:
+            self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    # ✅ Per-chat volume
+    def volume(self, chat_id):
+        return self.volumes.get(chat_id, DEFAULT_VOLUME)
+
+    async def set_volume(self, chat_id, volume):
+        volume = max(MIN_VOLUME, min(MAX_VOLUME, int(volume)))
+        if volume == DEFAULT_VOLUME:
+            self.volumes.pop(chat_id, None)
+            await self.storage.execute("DELETE FROM chat_volume WHERE chat_id = ?", (chat_id,))
+        else:
+            self.volumes[chat_id] = volume
+            await self.storage.execute(
+                "INSERT OR REPLACE INTO chat_volume (chat_id, volume) VALUES (?, ?)", (chat_id, volume)
+            )
+        return volume
+
+    # ✅ ffmpeg parameters
+    def gain(self, video_id):
+        gain = self.gains.get(video_id)
+        if gain is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return gain or 0.0
+
+    def filter_parameters(self, chat_id, video_id=None):
+        # Output options for the ffmpeg inside AudioPiped. "-atmid" places them
+        # after the input, where audio filters belong (plain parameters go
+        # before "-i" as input options).
+        db = self.gain(video_id) if video_id else 0.0
+        volume = self.volume(chat_id)
+        if volume != DEFAULT_VOLUME:
+            db += 20 * math.log10(volume / 100)
+        if abs(db) < 0.05:
+            return ""
+        return f"-atmid -af volume={db:.2f}dB"
+
+    # ✅ Background analysis
+    def schedule(self, video_id, source):
+        if (not self.enabled or not self.tasks or video_id in self.gains
+                or video_id in self.pending or video_id in self.failed):
+            return False
+        try:
+            self.jobs.put_nowait((video_id, source))
+        except asyncio.QueueFull:
+            return False
+        self.pending.add(video_id)
+        return True
+
+    async def _worker(self):
+        while True:
+            video_id, source = await self.jobs.get()
+            try:
+                await self._analyze(video_id, source)
+            except Exception as e:
+                # Not retried this run: the track simply keeps playing unadjusted.
+                self.failed.add(video_id)
+                logger.warning(f"⚠️ Loudness Analysis Error ({video_id}): {e}")
+            finally:
+                self.pending.discard(video_id)
+                self.jobs.task_done()
+
+    async def _analyze(self, video_id, source):
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-nostdin", "-hide_banner", "-nostats", "-threads", "1", "-i", source,
+            *FFMPEG_ANALYZE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), ANALYSIS_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        output = stderr.decode(errors="ignore")
+        if process.returncode != 0:
+            raise RuntimeError(output.strip()[-300:])
+        integrated, true_peak = parse_loudnorm(output)
+        gain = track_gain(integrated, true_peak)
+        self.gains[video_id] = gain
+        await self.storage.execute(
+            "INSERT OR REPLACE INTO loudness (video_id, integrated, true_peak, gain, analyzed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (video_id, integrated, true_peak, gain, time.time())
+        )
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+
+    def stats(self):
+        return {
+            "analyzed": len(self.gains),
+            "pending": len(self.pending),
+            "failed": len(self.failed),
+            "hits": self.hits,
+            "misses": self.misses,
+            "custom_volumes": len(self.volumes),
+        }
@@ -0,0 +1,93 @@
+# auth_cache.py
+import json
+import logging
+import aiofiles
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_GROUPS_FILE = "allowed_groups.json"
+ADMIN_COMMANDS_FILE = "admin_commands.json"
+MEMBER_CACHE_TTL = 300
+MEMBER_CACHE_SIZE = 50000
+
+
+async def _read_json(path):
+    try:
+        async with aiofiles.open(path, "r") as f:
+            data = await f.read()
+            return json.loads(data) if data else {}
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+async def _write_json(path, data):
+    try:
+        async with aiofiles.open(path, "w") as f:
+            await f.write(json.dumps(data))
+    except Exception as e:
+        logger.error(f"❌ Policy Save Error ({path}): {e}")
+
+
+class AuthCache:
+    # Both policy files are read once at startup and kept in memory; every change
+    # is written through to disk. Member lookups are cached for MEMBER_CACHE_TTL.
+
+    def __init__(self):
+        self.allowed_groups = {}
+        self.admin_commands = {"allowed_admin_commands": []}
+        self.members = TTLCache(maxsize=MEMBER_CACHE_SIZE, ttl=MEMBER_CACHE_TTL)
+
+    async def load(self):
+        self.allowed_groups = await _read_json(ALLOWED_GROUPS_FILE)
+        self.admin_commands = await _read_json(ADMIN_COMMANDS_FILE)
+        self.admin_commands.setdefault("allowed_admin_commands", [])
+
+    # ✅ Allowed Groups
+    def is_group_allowed(self, chat_id):
+        return str(chat_id) in self.allowed_groups
+
+    async def add_group(self, chat_id, title=""):
+        if self.is_group_allowed(chat_id):
+            return False
+        self.allowed_groups[str(chat_id)] = title
+        await _write_json(ALLOWED_GROUPS_FILE, self.allowed_groups)
+        return True
+
+    # ✅ Admin Command Policy
+    def allowed_admin_commands(self):
+        return list(self.admin_commands["allowed_admin_commands"])
+
+    def is_command_allowed(self, command):
+        return command in self.admin_commands["allowed_admin_commands"]
+
+    async def enable_command(self, command):
+        if self.is_command_allowed(command):
+            return False
+        self.admin_commands["allowed_admin_commands"].append(command)
+        await _write_json(ADMIN_COMMANDS_FILE, self.admin_commands)
+        return True
+
+    async def disable_command(self, command):
+        if not self.is_command_allowed(command):
+            return False
+        self.admin_commands["allowed_admin_commands"].remove(command)
+        await _write_json(ADMIN_COMMANDS_FILE, self.admin_commands)
+        return True
+
+    # ✅ Member Status
+    async def get_member_status(self, client, chat_id, user_id):
+        key = (chat_id, user_id)
+        status = self.members.get(key)
+        if status is None:
+            member = await client.get_chat_member(chat_id, user_id)
+            # pyrogram 2 returns a ChatMemberStatus enum, pyrogram 1 a string
+            status = str(getattr(member.status, "value", member.status))
+            self.members.set(key, status)
+        return status
+
+    def invalidate_member(self, chat_id, user_id):
+        self.members.pop((chat_id, user_id))
+
+
+auth_cache = AuthCache()
@@ -0,0 +1,508 @@
+# benchmarks/fakes.py
+# In-process stand-ins for pyrogram, pytgcalls, spotipy and yt-dlp so the real
+# handlers in main.py can be driven offline. install() must run before main.py
+# is imported. Every network call sleeps for a configurable injected latency.
+import asyncio
+import enum
+import itertools
+import re
+import sys
+import time
+import types
+
+LATENCY = {
+    "telegram": 0.05,   # any Bot API round-trip (reply, get_chat_member, ...)
+    "pytgcalls": 0.2,   # join/leave/change_stream
+    "spotify": 0.15,    # blocking spotipy search (runs in a thread)
+    "youtube": 0.8,     # blocking extract_info (runs in the extractor pool)
+}
+
+# yt-dlp calls happen inside the extractor processes; see the extractor stats instead.
+CALLS = {"telegram": 0, "pytgcalls": 0, "spotify": 0}
+_message_ids = itertools.count(1)
+
+
+async def _tg(kind="telegram"):
+    CALLS[kind] += 1
+    await asyncio.sleep(LATENCY[kind])
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+# ✅ pyrogram.filters
+class Filter:
+    def __init__(self, check):
+        self.check = check
+
+    def __call__(self, update):
+        return self.check(update)
+
+    def __and__(self, other):
+        return Filter(lambda u: self(u) and other(u))
+
+    def __or__(self, other):
+        return Filter(lambda u: self(u) or other(u))
+
+    def __invert__(self):
+        return Filter(lambda u: not self(u))
+
+
+def _command(commands, prefixes="/"):
+    commands = [commands] if isinstance(commands, str) else commands
+    prefixes = [prefixes] if isinstance(prefixes, str) else prefixes
+
+    def check(message):
+        text = getattr(message, "text", None) or ""
+        for prefix in prefixes:
+            if text.startswith(prefix):
+                parts = text[len(prefix):].split()
+                if parts and parts[0].lower() in commands:
+                    message.command = parts
+                    return True
+        return False
+    return Filter(check)
+
+
+def _regex(pattern):
+    compiled = re.compile(pattern)
+
+    def check(update):
+        match = compiled.search(getattr(update, "data", None) or getattr(update, "text", None) or "")
+        if match:
+            update.matches = [match]
+        return bool(match)
+    return Filter(check)
+
+
+def _user(ids):
+    ids = {ids} if isinstance(ids, int) else set(ids)
+    return Filter(lambda u: u.from_user is not None and u.from_user.id in ids)
+
+
+filters = types.SimpleNamespace(
+    command=_command,
+    regex=_regex,
+    user=_user,
+    group=Filter(lambda m: m.chat.type in ("group", "supergroup")),
+    private=Filter(lambda m: m.chat.type == "private"),
+)
+
+
+# ✅ pyrogram.types
+class InlineKeyboardButton:
+    def __init__(self, text, callback_data=None, url=None):
+        self.text = text
+        self.callback_data = callback_data
+        self.url = url
+
+
+class InlineKeyboardMarkup:
+    def __init__(self, inline_keyboard):
+        self.inline_keyboard = inline_keyboard
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class FakeChat:
+    def __init__(self, chat_id, chat_type="supergroup", title=""):
+        self.id = chat_id
+        self.type = chat_type
+        self.title = title or f"Group {chat_id}"
+
+
+class Message:
+    def __init__(self, chat, from_user=None, text="", client=None):
+        self.id = next(_message_ids)
+        self.chat = chat
+        self.from_user = from_user
+        self.text = text
+        self.command = text.split()
+        self.reply_to_message = None
+        self.matches = []
+        self._client = client
+
+    async def reply_text(self, text, **kwargs):
+        await _tg()
+        return Message(self.chat, None, text, self._client)
+
+    async def reply_photo(self, photo, caption="", **kwargs):
+        await _tg()
+        reply = Message(self.chat, None, caption, self._client)
+        reply.photo = types.SimpleNamespace(file_id=f"photo-{reply.id}")
+        return reply
+
+    async def edit(self, text, **kwargs):
+        await _tg()
+        self.text = text
+        return self
+
+    edit_text = edit
+
+    async def delete(self):
+        await _tg()
+        return True
+
+
+class CallbackQuery:
+    def __init__(self, message, from_user, data):
+        self.message = message
+        self.from_user = from_user
+        self.data = data
+        self.matches = []
+
+    async def answer(self, text="", show_alert=False):
+        await _tg()
+
+    async def edit_message_text(self, text, **kwargs):
+        await _tg()
+
+
+class ChatMemberStatus(enum.Enum):
+    # pyrogram 2 reports member statuses as this enum, not as strings
+    OWNER = "owner"
+    ADMINISTRATOR = "administrator"
+    MEMBER = "member"
+
+
+class ChatMember:
+    def __init__(self, user_id, status):
+        self.user = FakeUser(user_id)
+        self.status = status
+
+
+# ✅ pyrogram.Client
+class Client:
+    def __init__(self, name, *args, **kwargs):
+        self.name = name
+        self.is_connected = False
+        self.handlers = {"message": [], "callback_query": [], "chat_member_updated": []}
+        self.admins = None  # None: everyone is an administrator
+
+    def _register(self, kind, flt, group):
+        def decorator(func):
+            self.handlers[kind].append((group, flt, func))
+            self.handlers[kind].sort(key=lambda item: item[0])
+            return func
+        return decorator
+
+    def on_message(self, filters=None, group=0):
+        return self._register("message", filters, group)
+
+    def on_callback_query(self, filters=None, group=0):
+        return self._register("callback_query", filters, group)
+
+    def on_chat_member_updated(self, filters=None, group=0):
+        return self._register("chat_member_updated", filters, group)
+
+    async def dispatch(self, kind, update):
+        # Same rule as pyrogram: per group, the first matching handler runs.
+        handled_groups = set()
+        for group, flt, func in self.handlers[kind]:
+            if group in handled_groups:
+                continue
+            if flt is None or flt(update):
+                handled_groups.add(group)
+                await func(self, update)
+
+    async def start(self):
+        await _tg()
+        self.is_connected = True
+
+    async def stop(self):
+        self.is_connected = False
+
+    async def get_chat_member(self, chat_id, user_id):
+        await _tg()
+        if self.admins is None or user_id in self.admins:
+            status = ChatMemberStatus.ADMINISTRATOR
+        else:
+            status = ChatMemberStatus.MEMBER
+        return ChatMember(user_id, status)
+
+    async def send_document(self, chat_id, document, **kwargs):
+        await _tg()
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await _tg()
+        return Message(FakeChat(chat_id), None, text, self)
+
+    async def send_photo(self, chat_id, photo, caption="", **kwargs):
+        await _tg()
+        message = Message(FakeChat(chat_id), None, caption, self)
+        message.photo = types.SimpleNamespace(file_id=f"photo-{message.id}")
+        return message
+
+    async def copy_message(self, chat_id, from_chat_id, message_id, **kwargs):
+        await _tg()
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        await _tg()
+
+
+async def idle():
+    await asyncio.Event().wait()
+
+
+# ✅ pyrogram.errors
+class RPCError(Exception):
+    pass
+
+
+class FloodWait(RPCError):
+    def __init__(self, value=1):
+        super().__init__(f"FloodWait {value}")
+        self.value = value
+
+
+# ✅ pytgcalls
+class StreamType:
+    pulse_stream = "pulse"
+
+
+class AudioPiped:
+    def __init__(self, path, audio_parameters=None, headers=None, additional_ffmpeg_parameters=""):
+        self.path = path
+        self.additional_ffmpeg_parameters = additional_ffmpeg_parameters
+
+
+class AlreadyJoinedError(Exception):
+    pass
+
+
+class NotInGroupCallError(Exception):
+    pass
+
+
+class PyTgCalls:
+    def __init__(self, app, *args, **kwargs):
+        self.app = app
+        self.calls = {}
+        self.handlers = {"stream_end": [], "closed": [], "kicked": []}
+
+    def _register(self, event):
+        def decorator(func):
+            self.handlers[event].append(func)
+            return func
+        return decorator
+
+    def on_stream_end(self):
+        return self._register("stream_end")
+
+    def on_closed_voice_chat(self):
+        return self._register("closed")
+
+    def on_kicked(self):
+        return self._register("kicked")
+
+    @property
+    def active_calls(self):
+        return [types.SimpleNamespace(chat_id=chat_id) for chat_id in self.calls]
+
+    async def start(self):
+        await _tg("pytgcalls")
+
+    async def join_group_call(self, chat_id, stream, stream_type=None, **kwargs):
+        if chat_id in self.calls:
+            raise AlreadyJoinedError()
+        await _tg("pytgcalls")
+        self.calls[chat_id] = [stream, time.monotonic()]
+
+    async def change_stream(self, chat_id, stream):
+        if chat_id not in self.calls:
+            raise NotInGroupCallError()
+        await _tg("pytgcalls")
+        self.calls[chat_id] = [stream, time.monotonic()]
+
+    async def leave_group_call(self, chat_id):
+        if chat_id not in self.calls:
+            raise NotInGroupCallError()
+        await _tg("pytgcalls")
+        del self.calls[chat_id]
+
+    async def pause_stream(self, chat_id):
+        await _tg("pytgcalls")
+
+    async def resume_stream(self, chat_id):
+        await _tg("pytgcalls")
+
+    async def played_time(self, chat_id):
+        return int(time.monotonic() - self.calls[chat_id][1])
+
+    async def end_stream(self, chat_id):
+        # Simulate the current track finishing.
+        update = types.SimpleNamespace(chat_id=chat_id)
+        for handler in self.handlers["stream_end"]:
+            await handler(self, update)
+
+
+# ✅ yt_dlp (runs inside the forked extractor workers)
+class DownloadError(Exception):
+    def __init__(self, msg, exc_info=None):
+        super().__init__(msg)
+        self.exc_info = exc_info
+
+
+class YoutubeDL:
+    def __init__(self, opts=None):
+        self.opts = opts or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _entry(self, query):
+        video_id = f"{abs(hash(query)) % 10 ** 11:011d}"
+        if self.opts.get("extract_flat"):
+            # Flat entries point at the watch page; there is no stream URL yet.
+            return {"id": video_id, "title": f"Song {query}", "duration": 200,
+                    "url": f"https://www.youtube.com/watch?v={video_id}"}
+        return {
+            "id": video_id,
+            "title": f"Song {query}",
+            "duration": 200,
+            "url": f"https://rr1.googlevideo.com/videoplayback?id={video_id}&expire={int(time.time()) + 21600}",
+        }
+
+    def extract_info(self, url, download=False, process=True):
+        # A flat search costs one results page; a full search also extracts the entries.
+        search = url.startswith("ytsearch")
+        if self.opts.get("extract_flat") or not process:
+            time.sleep(LATENCY["youtube"] / 4)
+        else:
+            time.sleep(LATENCY["youtube"] * (1.25 if search else 1))
+        if search:
+            count, _, query = url[len("ytsearch"):].partition(":")
+            count = int(count or 1)
+            return {"entries": [self._entry(f"{query}#{i}" if i else query) for i in range(count)]}
+        return self._entry(url.rsplit("=", 1)[-1])
+
+    def sanitize_info(self, info):
+        return info
+
+
+# ✅ spotipy
+class SpotifyException(Exception):
+    def __init__(self, http_status=500, code=-1, msg=""):
+        super().__init__(msg)
+        self.http_status = http_status
+
+
+class SpotifyClientCredentials:
+    def __init__(self, client_id=None, client_secret=None, **kwargs):
+        self.cache_handler = types.SimpleNamespace(save_token_to_cache=lambda token: None)
+
+
+class Spotify:
+    def __init__(self, auth_manager=None, **kwargs):
+        self.auth_manager = auth_manager
+
+    def search(self, q, limit=1, type="track"):
+        CALLS["spotify"] += 1
+        time.sleep(LATENCY["spotify"])
+        track = {"name": q, "artists": [{"name": "Artist"}],
+                 "external_urls": {"spotify": f"https://open.spotify.com/track/{abs(hash(q))}"},
+                 "duration_ms": 200000}
+        return {"tracks": {"items": [track][:limit]}}
+
+    # Playlists and albums: PLAYLIST_SIZE generated tracks, served in pages
+    PLAYLIST_SIZE = 120
+
+    def _page(self, collection_id, offset, limit, wrap):
+        CALLS["spotify"] += 1
+        time.sleep(LATENCY["spotify"])
+        items = [{"name": f"{collection_id} track {i}", "artists": [{"name": "Artist"}], "duration_ms": 200000}
+                 for i in range(offset, min(offset + limit, self.PLAYLIST_SIZE))]
+        end = offset + limit
+        return {"items": [{"track": item} for item in items] if wrap else items,
+                "next": (collection_id, end, limit, wrap) if end < self.PLAYLIST_SIZE else None}
+
+    def playlist(self, playlist_id, fields=None):
+        CALLS["spotify"] += 1
+        time.sleep(LATENCY["spotify"])
+        return {"name": f"Playlist {playlist_id}"}
+
+    def playlist_items(self, playlist_id, limit=100, offset=0, fields=None, additional_types=None):
+        return self._page(playlist_id, offset, limit, wrap=True)
+
+    def album(self, album_id):
+        return {"name": f"Album {album_id}", "tracks": self._page(album_id, 0, 50, wrap=False)}
+
+    def next(self, page):
+        return self._page(*page["next"]) if page.get("next") else None
+
+
+def install(owner_id=1):
+    pyrogram = _module("pyrogram", Client=Client, filters=filters, idle=idle)
+    pyrogram.types = _module(
+        "pyrogram.types", Message=Message, InlineKeyboardMarkup=InlineKeyboardMarkup,
+        InlineKeyboardButton=InlineKeyboardButton, CallbackQuery=CallbackQuery
+    )
+    pyrogram.errors = _module(
+        "pyrogram.errors", RPCError=RPCError, FloodWait=FloodWait,
+        **{name: type(name, (RPCError,), {}) for name in (
+            "UserIsBlocked", "InputUserDeactivated", "PeerIdInvalid",
+            "ChatWriteForbidden", "ChannelPrivate", "MessageNotModified", "BadRequest"
+        )}
+    )
+    pyrogram.enums = _module("pyrogram.enums")
+
+    pytgcalls = _module("pytgcalls", PyTgCalls=PyTgCalls)
+    pytgcalls.types = _module("pytgcalls.types", StreamType=StreamType, AudioPiped=AudioPiped)
+    pytgcalls.types.input_stream = _module("pytgcalls.types.input_stream", AudioPiped=AudioPiped)
+    pytgcalls.exceptions = _module(
+        "pytgcalls.exceptions", AlreadyJoinedError=AlreadyJoinedError, NotInGroupCallError=NotInGroupCallError
+    )
+
+    yt_dlp = _module("yt_dlp", YoutubeDL=YoutubeDL)
+    yt_dlp.utils = _module("yt_dlp.utils", DownloadError=DownloadError)
+
+    spotipy = _module("spotipy", Spotify=Spotify)
+    spotipy.oauth2 = _module("spotipy.oauth2", SpotifyClientCredentials=SpotifyClientCredentials)
+    spotipy.exceptions = _module("spotipy.exceptions", SpotifyException=SpotifyException)
+
+    _module(
+        "config", API_ID=1, API_HASH="bench", BOT_TOKEN="bench", OWNER_ID=owner_id,
+        SPOTIFY_CLIENT_ID="bench", SPOTIFY_CLIENT_SECRET="bench"
+    )
+
+    try:
+        import aiofiles  # noqa: F401  (real file I/O is part of what we measure)
+    except ImportError:
+        _install_aiofiles()
+
+
+def _install_aiofiles():
+    # Minimal thread-backed aiofiles.open() for machines without the package.
+    class AsyncFile:
+        def __init__(self, path, mode):
+            self.path = path
+            self.mode = mode
+            self.file = None
+
+        async def __aenter__(self):
+            self.file = await asyncio.to_thread(open, self.path, self.mode)
+            return self
+
+        async def __aexit__(self, *exc):
+            await asyncio.to_thread(self.file.close)
+
+        async def read(self):
+            return await asyncio.to_thread(self.file.read)
+
+        async def write(self, data):
+            return await asyncio.to_thread(self.file.write, data)
+
+        async def seek(self, offset):
+            return await asyncio.to_thread(self.file.seek, offset)
+
+    _module("aiofiles", open=lambda path, mode="r", **kwargs: AsyncFile(path, mode))
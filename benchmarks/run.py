@@ -0,0 +1,250 @@
+# benchmarks/run.py
+# Offline load test for the real handlers in main.py.
+#
+#   python -m benchmarks.run --groups 2000 --songs 200
+#   python -m benchmarks.run --groups 500 --save baseline.json
+#   python -m benchmarks.run --groups 500 --baseline baseline.json   # exits 1 on regression
+#
+# Telegram, pytgcalls, Spotify and yt-dlp are replaced by benchmarks/fakes.py;
+# everything else (caches, queue store, extractor pool, ...) is the real code,
+# run in a throwaway working directory.
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks import fakes
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OWNER_ID = 1
+STARTUP_SLACK = 0.05
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+        "max_ms": round(max(samples, default=0) * 1000, 2),
+    }
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class LoopLagMonitor:
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+        self.task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        self.task.cancel()
+
+
+async def timed_dispatch(client, kind, update, bucket):
+    started = time.perf_counter()
+    try:
+        await client.dispatch(kind, update)
+    except Exception as e:
+        bucket.setdefault("errors", []).append(repr(e))
+    bucket.setdefault("latency", []).append(time.perf_counter() - started)
+
+
+async def bootstrap(main):
+    # main.bootstrap() itself: the same startup sequence, minus keep_alive and idle().
+    started = time.perf_counter()
+    main.prepare_process()
+    phases = await main.bootstrap()
+    return time.perf_counter() - started, {name: round(seconds, 3) for name, seconds in phases.items()}
+
+
+async def scenario(main, args):
+    app = main.app
+    for command in ("play", "stop"):
+        main.auth_cache.admin_commands["allowed_admin_commands"].append(command)
+    groups = [-(1000000000000 + index) for index in range(args.groups)]
+    for chat_id in groups:
+        main.auth_cache.allowed_groups[str(chat_id)] = ""
+
+    results = {}
+    slots = asyncio.Semaphore(args.concurrency or len(groups) * args.plays)
+    lag = LoopLagMonitor()
+    lag.start()
+
+    async def send(chat_id, user_id, text, name):
+        async with slots:
+            message = fakes.Message(fakes.FakeChat(chat_id), fakes.FakeUser(user_id), text, app)
+            await timed_dispatch(app, "message", message, results.setdefault(name, {}))
+
+    started = time.perf_counter()
+    # Every group asks for songs at (nearly) the same time.
+    await asyncio.gather(*(
+        send(chat_id, 10 + index, f".play song {random.randrange(args.songs)}", "play")
+        for index, chat_id in enumerate(groups) for _ in range(args.plays)
+    ))
+    play_elapsed = time.perf_counter() - started
+    # Track changes, then everybody stops. The fake tracks end right away, so
+    # the grace window that filters stale stream-end events is skipped.
+    main.engine.changed_at.clear()
+    async def end(chat_id):
+        t = time.perf_counter()
+        await main.call_py.end_stream(chat_id)
+        results.setdefault("stream_end", {}).setdefault("latency", []).append(time.perf_counter() - t)
+    await asyncio.gather(*(end(chat_id) for chat_id in list(main.call_py.calls)))
+    await asyncio.gather(*(send(chat_id, 10, ".stop", "stop") for chat_id in groups))
+    lag.stop()
+
+    # Micro-benchmarks of hot helpers.
+    admin = []
+    for chat_id in groups[:1000]:
+        t = time.perf_counter()
+        await main.is_admin_and_allowed(chat_id, 10, "play")
+        admin.append(time.perf_counter() - t)
+    enqueue = []
+    for index in range(1000):
+        chat_id = groups[index % len(groups)]
+        t = time.perf_counter()
+        await main.enqueue_track(chat_id, main.Track("x", main.youtube_url("x"), f"t{index}", 200, "bench"))
+        enqueue.append(time.perf_counter() - t)
+    for chat_id in groups:
+        await main.queues.clear(chat_id)
+
+    report = {
+        "config": {"groups": args.groups, "plays_per_group": args.plays, "songs": args.songs,
+                   "latency": dict(fakes.LATENCY)},
+        "throughput_plays_per_s": round(args.groups * args.plays / play_elapsed, 1),
+        "handlers": {name: summarize(bucket.get("latency", [])) for name, bucket in results.items()},
+        "errors": {name: len(bucket.get("errors", [])) for name, bucket in results.items()},
+        "event_loop_lag": summarize(lag.samples),
+        "is_admin_and_allowed_cached": summarize(admin),
+        "enqueue_track": summarize(enqueue),
+        "resolver": main.resolver.stats(),
+        "thumbnails": main.thumbnails.stats(),
+        "loudness": main.audio.stats(),
+        "extractor": main.extractor.stats(),
+        "fake_calls": dict(fakes.CALLS),
+        "peak_rss_mb": round(rss_mb(), 1),
+    }
+    first_errors = [e for bucket in results.values() for e in bucket.get("errors", [])[:3]]
+    if first_errors:
+        report["sample_errors"] = first_errors[:5]
+    return report
+
+
+def compare(report, baseline, tolerance):
+    # p99s that got worse by more than `tolerance` (relative) are regressions.
+    regressions = []
+    for section in ("handlers",):
+        for name, current in report[section].items():
+            previous = baseline.get(section, {}).get(name)
+            if previous and previous["p99_ms"] and current["p99_ms"] > previous["p99_ms"] * (1 + tolerance):
+                regressions.append(f"{section}.{name}.p99 {previous['p99_ms']}ms -> {current['p99_ms']}ms")
+    for name in ("event_loop_lag", "is_admin_and_allowed_cached", "enqueue_track"):
+        previous, current = baseline.get(name), report[name]
+        if previous and previous["p99_ms"] and current["p99_ms"] > max(previous["p99_ms"] * (1 + tolerance), 1.0):
+            regressions.append(f"{name}.p99 {previous['p99_ms']}ms -> {current['p99_ms']}ms")
+    # Time to ready; small absolute slack so a few ms of noise on a fast start don't count.
+    for name in ("import_seconds", "startup_seconds"):
+        previous, current = baseline.get(name), report[name]
+        if previous is not None and current > max(previous * (1 + tolerance), previous + STARTUP_SLACK):
+            regressions.append(f"{name} {previous}s -> {current}s")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline RolaVibe handler benchmark")
+    parser.add_argument("--groups", type=int, default=1000)
+    parser.add_argument("--plays", type=int, default=1, help=".play commands per group")
+    parser.add_argument("--songs", type=int, default=100, help="distinct songs requested")
+    parser.add_argument("--concurrency", type=int, default=0, help="max commands in flight (0 = all)")
+    parser.add_argument("--telegram-latency", type=float, default=fakes.LATENCY["telegram"])
+    parser.add_argument("--pytgcalls-latency", type=float, default=fakes.LATENCY["pytgcalls"])
+    parser.add_argument("--spotify-latency", type=float, default=fakes.LATENCY["spotify"])
+    parser.add_argument("--youtube-latency", type=float, default=fakes.LATENCY["youtube"])
+    parser.add_argument("--extractor-workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write the JSON report here")
+    parser.add_argument("--baseline", help="compare p99s against this report")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    return parser.parse_args(argv)
+
+
+def run(argv=None):
+    args = parse_args(argv)
+    random.seed(args.seed)
+    fakes.LATENCY.update(
+        telegram=args.telegram_latency, pytgcalls=args.pytgcalls_latency,
+        spotify=args.spotify_latency, youtube=args.youtube_latency
+    )
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("EXTRACTOR_WORKERS", str(args.extractor_workers))
+    os.environ.setdefault("EXTRACTOR_QUEUE_WAIT", "600")
+    os.environ.setdefault("PORT", "0")
+    # No ffmpeg behind the fake stream URLs: gains are never measured here
+    os.environ.setdefault("LOUDNESS_ENABLED", "0")
+    fakes.install(owner_id=OWNER_ID)
+
+    workdir = tempfile.mkdtemp(prefix="rolavibe-bench-")
+    cwd = os.getcwd()
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(workdir)
+    try:
+        import_started = time.perf_counter()
+        import main
+        import_seconds = time.perf_counter() - import_started
+
+        async def go():
+            startup, phases = await bootstrap(main)
+            report = await scenario(main, args)
+            report["import_seconds"] = round(import_seconds, 3)
+            report["startup_seconds"] = round(startup, 3)
+            report["startup_phases"] = phases
+            await main.shutdown()
+            return report
+
+        report = asyncio.run(go())
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("❌ Regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            return 1
+        print("✅ No regressions against baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
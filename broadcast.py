@@ -0,0 +1,304 @@
+# broadcast.py
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+from pyrogram.errors import (
+    FloodWait, RPCError, UserIsBlocked, InputUserDeactivated,
+    PeerIdInvalid, ChatWriteForbidden, ChannelPrivate
+)
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = 25          # messages/second across all chats (Telegram allows ~30)
+GLOBAL_BURST = 25
+PER_CHAT_INTERVAL = 1.0   # never more than one message per chat per second
+CONCURRENCY = 10
+MAX_FLOOD_RETRIES = 3
+CHECKPOINT_INTERVAL = 2
+PROGRESS_INTERVAL = 5
+THROUGHPUT_WINDOW = 10
+INFLIGHT_GRACE = 10       # seconds a stopping run waits for sends already in flight
+
+PERMANENT_ERRORS = (UserIsBlocked, InputUserDeactivated, PeerIdInvalid, ChatWriteForbidden, ChannelPrivate)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chats (
+    chat_id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    first_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS broadcasts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    from_chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    progress_chat_id INTEGER,
+    progress_message_id INTEGER,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS broadcast_targets (
+    broadcast_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    PRIMARY KEY (broadcast_id, chat_id)
+) WITHOUT ROWID;
+"""
+
+
+def message_id_of(message):
+    # pyrogram 2 renamed Message.message_id to Message.id
+    return getattr(message, "id", None) or message.message_id
+
+
+class ChatRegistry:
+    # Every chat the bot has seen. Lookups hit an in-memory set; only chats seen
+    # for the first time cost a (single-row) write.
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.known = {}
+
+    async def load(self):
+        await self.storage.executescript(SCHEMA)
+        rows = await self.storage.fetchall("SELECT chat_id, type FROM chats")
+        self.known = dict(rows)
+
+    def seen(self, chat_id, chat_type):
+        if chat_id in self.known:
+            return False
+        self.known[chat_id] = chat_type
+        self.storage.execute_later(
+            "INSERT OR IGNORE INTO chats (chat_id, type, first_seen) VALUES (?, ?, ?)",
+            (chat_id, chat_type, time.time())
+        )
+        return True
+
+    def count(self, *types):
+        if not types:
+            return len(self.known)
+        return sum(1 for chat_type in self.known.values() if chat_type in types)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class BroadcastJob:
+    def __init__(self, broadcast_id, from_chat_id, message_id, progress_chat_id=None, progress_message_id=None):
+        self.id = broadcast_id
+        self.from_chat_id = from_chat_id
+        self.message_id = message_id
+        self.progress_chat_id = progress_chat_id
+        self.progress_message_id = progress_message_id
+        self.pending = deque()
+        self.parked = []
+        self.retries = {}
+        self.last_sent = {}
+        self.results = []
+        self.total = 0
+        self.sent = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self.recent = deque()
+        self.task = None
+
+    @property
+    def done(self):
+        return self.sent + self.failed
+
+    def throughput(self):
+        cutoff = time.monotonic() - THROUGHPUT_WINDOW
+        while self.recent and self.recent[0] < cutoff:
+            self.recent.popleft()
+        return len(self.recent) / THROUGHPUT_WINDOW
+
+    def summary(self):
+        eta = (self.total - self.done) / self.throughput() if self.throughput() else 0
+        return (
+            f"📢 **Broadcast #{self.id}**\n\n"
+            f"✅ Sent: `{self.sent}` / `{self.total}`\n"
+            f"❌ Failed: `{self.failed}`\n"
+            f"⏳ Parked (FloodWait): `{len(self.parked)}`\n"
+            f"⚡ Throughput: `{self.throughput():.1f}` msg/s\n"
+            f"🕒 ETA: `{int(eta // 60)}m {int(eta % 60)}s`"
+        )
+
+
+class Broadcaster:
+    def __init__(self, storage, registry):
+        self.storage = storage
+        self.registry = registry
+        self.bucket = TokenBucket(GLOBAL_RATE, GLOBAL_BURST)
+        self.job = None
+
+    @property
+    def running(self):
+        return self.job is not None and self.job.task is not None and not self.job.task.done()
+
+    async def start(self, client, from_chat_id, message_id, progress_chat_id=None, progress_message_id=None):
+        if self.running:
+            return None
+        await self.storage.execute(
+            "INSERT INTO broadcasts (from_chat_id, message_id, progress_chat_id, progress_message_id, status, created_at) "
+            "VALUES (?, ?, ?, ?, 'running', ?)",
+            (from_chat_id, message_id, progress_chat_id, progress_message_id, time.time())
+        )
+        row = await self.storage.fetchone("SELECT MAX(id) FROM broadcasts")
+        broadcast_id = row[0]
+        await self.storage.executemany(
+            "INSERT OR IGNORE INTO broadcast_targets (broadcast_id, chat_id) VALUES (?, ?)",
+            ((broadcast_id, chat_id) for chat_id in list(self.registry.known))
+        )
+        job = BroadcastJob(broadcast_id, from_chat_id, message_id, progress_chat_id, progress_message_id)
+        return await self._launch(client, job)
+
+    async def resume(self, client):
+        # Pick up a broadcast that was interrupted by a restart.
+        row = await self.storage.fetchone(
+            "SELECT id, from_chat_id, message_id, progress_chat_id, progress_message_id "
+            "FROM broadcasts WHERE status = 'running' ORDER BY id DESC LIMIT 1"
+        )
+        if row is None or self.running:
+            return None
+        logger.info(f"📢 Resuming broadcast #{row[0]}")
+        return await self._launch(client, BroadcastJob(*row))
+
+    async def _launch(self, client, job):
+        rows = await self.storage.fetchall(
+            "SELECT chat_id, status FROM broadcast_targets WHERE broadcast_id = ?", (job.id,)
+        )
+        job.total = len(rows)
+        for chat_id, status in rows:
+            if status == "pending":
+                job.pending.append(chat_id)
+            elif status == "sent":
+                job.sent += 1
+            else:
+                job.failed += 1
+        self.job = job
+        job.task = asyncio.create_task(self._run(client, job))
+        return job
+
+    async def cancel(self):
+        if not self.running:
+            return False
+        self.job.task.cancel()
+        await self.storage.execute("UPDATE broadcasts SET status = 'cancelled' WHERE id = ?", (self.job.id,))
+        # Returns once the in-flight sends are recorded and the last flush is done.
+        await asyncio.wait([self.job.task])
+        return True
+
+    async def _run(self, client, job):
+        slots = asyncio.Semaphore(CONCURRENCY)
+        inflight = set()
+        checkpoint = asyncio.create_task(self._checkpoint_loop(client, job))
+        try:
+            while job.pending or job.parked or inflight:
+                now = time.monotonic()
+                while job.parked and job.parked[0][0] <= now:
+                    job.pending.append(heapq.heappop(job.parked)[1])
+                if not job.pending:
+                    wait = job.parked[0][0] - now if job.parked else 1
+                    if inflight:
+                        await asyncio.wait(inflight, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                    else:
+                        await asyncio.sleep(wait)
+                    continue
+                chat_id = job.pending.popleft()
+                ready_at = job.last_sent.get(chat_id, 0) + PER_CHAT_INTERVAL
+                if ready_at > now:
+                    heapq.heappush(job.parked, (ready_at, chat_id))
+                    continue
+                await slots.acquire()
+                await self.bucket.acquire()
+                task = asyncio.create_task(self._deliver(client, job, chat_id))
+                inflight.add(task)
+                task.add_done_callback(inflight.discard)
+                task.add_done_callback(lambda _: slots.release())
+            await self._flush(job)
+            await self.storage.execute("UPDATE broadcasts SET status = 'done' WHERE id = ?", (job.id,))
+            logger.info(f"✅ Broadcast #{job.id} finished: {job.sent} sent, {job.failed} failed")
+        finally:
+            checkpoint.cancel()
+            # A cancelled run still records the sends already handed to Telegram;
+            # left unflushed they would stay pending and be sent again.
+            if inflight:
+                _, unfinished = await asyncio.wait(inflight, timeout=INFLIGHT_GRACE)
+                for task in unfinished:
+                    task.cancel()
+            await self._flush(job)
+            await self._report(client, job)
+
+    async def _deliver(self, client, job, chat_id):
+        job.last_sent[chat_id] = time.monotonic()
+        try:
+            await client.copy_message(chat_id, job.from_chat_id, job.message_id)
+            job.sent += 1
+            job.recent.append(time.monotonic())
+            job.results.append(("sent", chat_id))
+        except FloodWait as e:
+            # Park only this chat; the rest of the run keeps going.
+            wait = getattr(e, "value", None) or getattr(e, "x", 1)
+            job.retries[chat_id] = job.retries.get(chat_id, 0) + 1
+            if job.retries[chat_id] > MAX_FLOOD_RETRIES:
+                job.failed += 1
+                job.results.append(("failed", chat_id))
+            else:
+                heapq.heappush(job.parked, (time.monotonic() + wait, chat_id))
+        except PERMANENT_ERRORS:
+            job.failed += 1
+            job.results.append(("failed", chat_id))
+        except RPCError as e:
+            logger.warning(f"⚠️ Broadcast to {chat_id} failed: {e}")
+            job.failed += 1
+            job.results.append(("failed", chat_id))
+        except Exception as e:
+            # Timeouts, dropped connections: count the chat as failed so the
+            # totals add up and the task never ends with an unretrieved error.
+            logger.error(f"❌ Broadcast to {chat_id} failed: {e!r}")
+            job.failed += 1
+            job.results.append(("failed", chat_id))
+
+    async def _flush(self, job):
+        results, job.results = job.results, []
+        if results:
+            await self.storage.executemany(
+                "UPDATE broadcast_targets SET status = ? WHERE broadcast_id = ? AND chat_id = ?",
+                ((status, job.id, chat_id) for status, chat_id in results)
+            )
+
+    async def _checkpoint_loop(self, client, job):
+        last_report = time.monotonic()
+        while True:
+            await asyncio.sleep(CHECKPOINT_INTERVAL)
+            try:
+                await self._flush(job)
+                if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    await self._report(client, job)
+            except Exception as e:
+                logger.error(f"❌ Broadcast Checkpoint Error: {e}")
+
+    async def _report(self, client, job):
+        if not job.progress_chat_id:
+            return
+        try:
+            await client.edit_message_text(job.progress_chat_id, job.progress_message_id, job.summary())
+        except RPCError:
+            pass  # "message not modified" and friends
@@ -0,0 +1,48 @@
+# cache.py
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    # Small LRU cache where every entry also expires after `ttl` seconds.
+    # A per-entry ttl can be passed to set() when the value knows its own lifetime.
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        entry = self.data.get(key, _MISSING)
+        if entry is not _MISSING:
+            value, expires_at = entry
+            if expires_at > time.monotonic():
+                self.data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self.data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self.data[key] = (value, time.monotonic() + ttl)
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        entry = self.data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
@@ -0,0 +1,213 @@
+# chat_queue.py
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from itertools import islice
+
+logger = logging.getLogger(__name__)
+
+QUEUE_MAX_LENGTH = int(os.getenv("QUEUE_MAX_LENGTH", 200))
+QUEUE_IDLE_TTL = int(os.getenv("QUEUE_IDLE_TTL", 6 * 60 * 60))
+EVICTION_INTERVAL = 10 * 60
+
+
+class Track:
+    # `id` is the YouTube video id, or a marker ("video" for .playvideo links,
+    # resolver.QUERY_PLACEHOLDER for unresolved playlist entries). `url` is the
+    # page URL (or the search query of a placeholder).
+    __slots__ = ("id", "url", "title", "duration", "requester", "added_at")
+
+    def __init__(self, id, url, title, duration=0, requester="", added_at=None):
+        self.id = id
+        self.url = url
+        self.title = title
+        self.duration = duration
+        self.requester = requester
+        self.added_at = added_at or time.time()
+
+    def resolved(self, id, url, title, duration):
+        # A copy for the resolved video, keeping who asked for it and when.
+        return Track(id, url, title, duration, self.requester, self.added_at)
+
+    def row(self):
+        return (self.url, self.title, self.id, self.duration, self.requester, self.added_at)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class ChatQueue:
+    # One chat's queue: the head is the track playing now. Tracks live in a
+    # deque, so playing the next one or skipping is O(1) per track.
+    __slots__ = ("chat_id", "tracks", "lock", "max_length", "touched")
+
+    def __init__(self, chat_id, max_length=QUEUE_MAX_LENGTH):
+        self.chat_id = chat_id
+        self.tracks = deque()
+        self.lock = asyncio.Lock()
+        self.max_length = max_length
+        self.touched = time.monotonic()
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def __iter__(self):
+        return iter(self.tracks)
+
+    @property
+    def current(self):
+        return self.tracks[0] if self.tracks else None
+
+    def upcoming(self, count):
+        return list(islice(self.tracks, 1, 1 + count))
+
+    def add(self, tracks):
+        # Returns the tracks that fit; raises QueueFull when none do.
+        room = self.max_length - len(self.tracks)
+        if room <= 0:
+            raise QueueFull(f"Queue is full ({self.max_length} tracks)")
+        accepted = tracks[:room]
+        self.tracks.extend(accepted)
+        self.touched = time.monotonic()
+        return accepted
+
+    def pop(self, count=1):
+        popped = [self.tracks.popleft() for _ in range(min(count, len(self.tracks)))]
+        self.touched = time.monotonic()
+        return popped
+
+    def replace(self, old, new):
+        for index, track in enumerate(self.tracks):
+            if track is old:
+                self.tracks[index] = new
+                return True
+        return False
+
+    def clear(self):
+        self.tracks.clear()
+
+
+class QueueManager:
+    # Every chat's ChatQueue, each with its own lock: enqueues in different
+    # groups never wait on each other. Empty queues are dropped immediately and
+    # queues of chats idle for QUEUE_IDLE_TTL are evicted, so memory follows the
+    # number of chats actually using the bot. Writes go through to QueueStore
+    # while the chat's lock is held, so memory and SQLite agree on the order.
+
+    def __init__(self, store, max_length=QUEUE_MAX_LENGTH, idle_ttl=QUEUE_IDLE_TTL):
+        self.store = store
+        self.max_length = max_length
+        self.idle_ttl = idle_ttl
+        self.queues = {}
+        self.eviction_task = None
+
+    def get(self, chat_id):
+        return self.queues.get(chat_id)
+
+    def _queue(self, chat_id):
+        queue = self.queues.get(chat_id)
+        if queue is None:
+            queue = self.queues[chat_id] = ChatQueue(chat_id, self.max_length)
+        return queue
+
+    def __len__(self):
+        return len(self.queues)
+
+    def items(self):
+        return self.queues.items()
+
+    def current(self, chat_id):
+        queue = self.queues.get(chat_id)
+        return queue.current if queue else None
+
+    def upcoming(self, chat_id, count):
+        queue = self.queues.get(chat_id)
+        return queue.upcoming(count) if queue else []
+
+    async def load(self):
+        self.queues = {}
+        for chat_id, tracks in (await self.store.load()).items():
+            self._queue(chat_id).tracks.extend(tracks[:self.max_length])
+
+    async def enqueue(self, chat_id, tracks):
+        # Returns the tracks that fit under max_length; raises QueueFull when none do.
+        while True:
+            queue = self._queue(chat_id)
+            async with queue.lock:
+                if self.queues.get(chat_id) is not queue:
+                    continue  # emptied and dropped while we waited for the lock
+                try:
+                    accepted = queue.add(tracks)
+                finally:
+                    if not queue.tracks:
+                        self._drop(queue)
+                try:
+                    await self.store.extend(chat_id, accepted)
+                except Exception as e:
+                    logger.error(f"❌ Queue Save Error: {e}")
+                return accepted
+
+    async def replace(self, chat_id, old, new):
+        queue = self.queues.get(chat_id)
+        if queue is None:
+            return False
+        async with queue.lock:
+            if not queue.replace(old, new):
+                return False
+            try:
+                await self.store.replace(chat_id, old, new)
+            except Exception as e:
+                logger.error(f"❌ Queue Save Error: {e}")
+        return True
+
+    async def pop(self, chat_id, count=1):
+        # Drops the head (and `count - 1` more for skips); returns what was removed.
+        queue = self.queues.get(chat_id)
+        if queue is None:
+            return []
+        async with queue.lock:
+            popped = queue.pop(count)
+            if not queue.tracks:
+                self._drop(queue)
+            try:
+                await self.store.pop(chat_id, len(popped))
+            except Exception as e:
+                logger.error(f"❌ Queue Save Error: {e}")
+        return popped
+
+    async def clear(self, chat_id):
+        queue = self.queues.pop(chat_id, None) or ChatQueue(chat_id)
+        async with queue.lock:
+            queue.clear()
+            try:
+                await self.store.clear(chat_id)
+            except Exception as e:
+                logger.error(f"❌ Queue Save Error: {e}")
+
+    def _drop(self, queue):
+        if self.queues.get(queue.chat_id) is queue:
+            del self.queues[queue.chat_id]
+
+    async def evict_idle(self, is_active):
+        cutoff = time.monotonic() - self.idle_ttl
+        idle = [
+            chat_id for chat_id, queue in self.queues.items()
+            if queue.touched < cutoff and not queue.lock.locked() and not is_active(chat_id)
+        ]
+        for chat_id in idle:
+            await self.clear(chat_id)
+        if idle:
+            logger.info(f"🧹 Evicted {len(idle)} idle queues")
+
+    def start(self, is_active):
+        async def loop():
+            while True:
+                await asyncio.sleep(EVICTION_INTERVAL)
+                try:
+                    await self.evict_idle(is_active)
+                except Exception as e:
+                    logger.error(f"❌ Queue Eviction Error: {e}")
+        self.eviction_task = asyncio.create_task(loop())
@@ -0,0 +1,256 @@
+# extractor.py
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+EXTRACTOR_WORKERS = int(os.getenv("EXTRACTOR_WORKERS", os.cpu_count() or 2))
+EXTRACTOR_MAX_PENDING = int(os.getenv("EXTRACTOR_MAX_PENDING", EXTRACTOR_WORKERS * 8))
+EXTRACTOR_TIMEOUT = float(os.getenv("EXTRACTOR_TIMEOUT", 30))
+EXTRACTOR_QUEUE_WAIT = float(os.getenv("EXTRACTOR_QUEUE_WAIT", 5))
+
+# ✅ YouTube-DL Options
+YDL_OPTIONS = {
+    "audio": {
+        'format': 'bestaudio',
+        'quiet': True,
+        'noplaylist': True,
+        'socket_timeout': 10
+    },
+    # Search results only: ids, titles and durations, no formats or signatures
+    "flat": {
+        'extract_flat': 'in_playlist',
+        'quiet': True,
+        'noplaylist': True,
+        'socket_timeout': 10
+    },
+}
+
+
+class ExtractorBusy(Exception):
+    pass
+
+
+class ExtractionError(Exception):
+    # yt-dlp's DownloadError as seen by the bot: unavailable video, unsupported
+    # site, no stream. The bot process never imports yt_dlp itself.
+    pass
+
+
+# ✅ Worker Process Side
+# yt_dlp is imported only here, inside the workers: all of them load it in
+# parallel while the bot finishes starting up.
+_ydl_instances = {}
+
+
+def _init_worker(pids):
+    # Report this worker's pid so the bot can kill it if a job hangs.
+    pids.send(os.getpid())
+    import yt_dlp
+    for name, opts in YDL_OPTIONS.items():
+        _ydl_instances[name] = yt_dlp.YoutubeDL(opts)
+
+
+def _extract(url, profile):
+    import yt_dlp
+    ydl = _ydl_instances.get(profile)
+    if ydl is None:
+        ydl = _ydl_instances[profile] = yt_dlp.YoutubeDL(YDL_OPTIONS[profile])
+    try:
+        return ydl.sanitize_info(ydl.extract_info(url, download=False))
+    except yt_dlp.utils.DownloadError as e:
+        # Re-raise without exc_info: tracebacks can't be pickled back to the bot.
+        raise ExtractionError(str(e)) from None
+    except Exception as e:
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
+
+def _ping():
+    return os.getpid()
+
+
+class ExtractionService:
+    # yt-dlp extraction is CPU- and GIL-heavy, so it runs in its own process pool
+    # where every worker keeps warm YoutubeDL instances. At most `max_pending`
+    # requests are admitted at once; callers wait up to `queue_wait` seconds for
+    # a slot and then get ExtractorBusy instead of piling up behind the pool.
+    # Of those, only one job per worker is handed to the pool at a time, so a
+    # submitted job starts right away and `timeout` measures its run time.
+
+    def __init__(self, workers=EXTRACTOR_WORKERS, max_pending=EXTRACTOR_MAX_PENDING,
+                 timeout=EXTRACTOR_TIMEOUT, queue_wait=EXTRACTOR_QUEUE_WAIT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.queue_wait = queue_wait
+        self.pool = None
+        self.ready = None
+        self.slots = None
+        self.running = None
+        self.jobs = {}  # pool -> its submitted, unfinished jobs
+        self.pids = {}  # pool -> pipe its workers report their pids on
+        self.hung = set()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=500)
+
+    def _new_pool(self, method):
+        context = multiprocessing.get_context(method)
+        reader, writer = context.Pipe(duplex=False)
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(writer,)
+        )
+        self.jobs[pool] = set()
+        self.pids[pool] = (reader, writer)
+        return pool
+
+    def spawn(self):
+        # fork keeps workers from re-importing main.py. The processes are forked
+        # right here (ProcessPoolExecutor launches them all on the first submit
+        # with fork), so call this before the process starts other threads.
+        # Returns the pings that complete once every worker has loaded yt_dlp.
+        if self.pool is None:
+            self.pool = self._new_pool("fork")
+            self.slots = asyncio.Semaphore(self.max_pending)
+            self.running = asyncio.Semaphore(self.workers)
+            loop = asyncio.get_running_loop()
+            self.ready = asyncio.gather(*(loop.run_in_executor(self.pool, _ping) for _ in range(self.workers)))
+        return self.ready
+
+    async def start(self):
+        await self.spawn()
+        logger.info(f"✅ Extractor pool started with {self.workers} workers")
+
+    def shutdown(self):
+        for pool in list(self.jobs):
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._close_pids(pool)
+        self.jobs.clear()
+        self.pool = None
+
+    # ✅ Job accounting
+    def _release(self):
+        self.pending -= 1
+        self.slots.release()
+
+    def _job_done(self, pool, job):
+        # Runs when the job really ended in its worker, not when the caller gave
+        # up on it: only then are its worker and admission slot free again.
+        self.running.release()
+        self._release()
+        self.hung.discard(job)
+        jobs = self.jobs.get(pool)
+        if jobs is not None:
+            jobs.discard(job)
+            self._reap(pool)
+
+    def _retire(self, job):
+        # A job ran past the timeout: new work goes to a fresh pool, and the old
+        # one is torn down once only hung jobs are left in it.
+        self.hung.add(job)
+        # The bot runs threads by now, so the new workers come from a
+        # forkserver rather than a fork of this process (like any non-fork
+        # start method, they import the main module again).
+        if self.pool is not None and job in self.jobs.get(self.pool, ()):
+            retired, self.pool = self.pool, self._new_pool("forkserver")
+            logger.warning("⚠️ Extractor job hung; replacing the worker pool")
+            self._reap(retired)
+
+    def _reap(self, pool):
+        jobs = self.jobs[pool]
+        if pool is self.pool or not jobs <= self.hung:
+            return
+        del self.jobs[pool]
+        # No public API kills a busy worker; terminating fails the hung jobs
+        # with BrokenProcessPool, which releases their slots.
+        reader, _ = self.pids[pool]
+        while reader.poll():
+            pid = reader.recv()
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        pool.shutdown(wait=False, cancel_futures=True)
+        self._close_pids(pool)
+
+    def _close_pids(self, pool):
+        for connection in self.pids.pop(pool, ()):
+            connection.close()
+
+    @traced("yt-dlp")
+    async def extract(self, url, profile="audio"):
+        if self.pool is None:
+            self.spawn()
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.queue_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ExtractorBusy("Extractor queue is full") from None
+        self.pending += 1
+        # Jobs past the worker count wait here, where they can still be
+        # cancelled and their timeout hasn't started.
+        try:
+            await self.running.acquire()
+        except BaseException:
+            self._release()
+            raise
+        loop = asyncio.get_running_loop()
+        pool = self.pool
+        try:
+            job = pool.submit(_extract, url, profile)
+        except Exception:
+            self.running.release()
+            self._release()
+            raise
+        self.jobs[pool].add(job)
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._job_done, pool, job))
+        started = time.monotonic()
+        # If the caller is cancelled (e.g. it lost a resolver race), a job not
+        # yet picked up is dropped; a running one finishes and only then frees
+        # its slot.
+        try:
+            info = await asyncio.wait_for(asyncio.wrap_future(job), self.timeout)
+            self.completed += 1
+            return info
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            if not job.done():
+                self._retire(job)
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.latencies.append(time.monotonic() - started)
+
+    def stats(self):
+        samples = sorted(self.latencies)
+        def pct(p):
+            return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
+        return {
+            "workers": self.workers,
+            "queue_depth": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "latency_p50": pct(0.50),
+            "latency_p95": pct(0.95),
+        }
+
+
+extractor = ExtractionService()
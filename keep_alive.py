@@ -1,16 +1,81 @@
-# keep_alive.py
-from flask import Flask
-from threading import Thread
+import asyncio
+import json
+import logging
+import os
+from metrics import registry
+from tracing import watchdog, stalls, slow_traces
 
-app = Flask('')
+logger = logging.getLogger(__name__)
 
-@app.route('/')
-def home():
-    return "Bot is alive!"
+HEALTH_HOST = "0.0.0.0"
+HEALTH_PORT = int(os.getenv("PORT", 8080))
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", 1.0))
 
-def run():
-    app.run(host='0.0.0.0', port=8080)
+health_checks = {}
 
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
+# Loop lag comes from the stall watchdog's heartbeat; there is no second timer.
+registry.register_collector(lambda: [
+    ("rolavibe_event_loop_lag_seconds", "gauge", "Last measured event loop lag", [({}, watchdog.lag)]),
+    ("rolavibe_event_loop_stalls", "gauge", "Recent event loop stalls kept for inspection", [({}, len(stalls))]),
+    ("rolavibe_slow_traces", "gauge", "Recent slow handler traces kept for inspection", [({}, len(slow_traces))])
+])
+
+
+def health():
+    checks = {name: bool(check()) for name, check in health_checks.items()}
+    checks["loop_lag"] = watchdog.lag < LOOP_LAG_THRESHOLD
+    return all(checks.values()), {"loop_lag_seconds": round(watchdog.lag, 4), "checks": checks}
+
+
+def _response(status, body, content_type):
+    body = body.encode()
+    return (
+        f"HTTP/1.1 {status}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode() + body
+
+
+async def handle(reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5)
+        # Drain headers; nothing here needs them.
+        while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode(errors="ignore").split()
+        path = parts[1].split("?")[0] if len(parts) > 1 else "/"
+
+        if path == "/healthz":
+            ok, details = health()
+            payload = _response("200 OK" if ok else "503 Service Unavailable",
+                                json.dumps(details), "application/json")
+        elif path == "/metrics":
+            payload = _response("200 OK", registry.render(), "text/plain; version=0.0.4")
+        elif path == "/":
+            payload = _response("200 OK", "Bot is alive!", "text/plain")
+        else:
+            payload = _response("404 Not Found", "Not Found", "text/plain")
+        writer.write(payload)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    except Exception as e:
+        logger.error(f"❌ Health Server Error: {e}")
+    finally:
+        writer.close()
+
+
+async def keep_alive(checks=None):
+    # Runs on the bot's own event loop: no extra thread, no WSGI server. The
+    # health endpoints are optional: if the port can't be bound the bot runs
+    # without them (None is returned).
+    health_checks.update(checks or {})
+    watchdog.start()
+    try:
+        server = await asyncio.start_server(handle, HEALTH_HOST, HEALTH_PORT)
+    except OSError as e:
+        logger.error(f"❌ Health Server Error: cannot listen on :{HEALTH_PORT}: {e}")
+        return None
+    logger.info(f"✅ Health server listening on :{HEALTH_PORT}")
+    return server
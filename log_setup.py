@@ -0,0 +1,157 @@
+# log_setup.py
+import atexit
+import gzip
+import io
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+from datetime import datetime, timedelta
+
+LOG_FILE = "rolavibe.log"
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG")
+# Per-logger overrides, e.g. "pyrogram=WARNING,pytgcalls=INFO"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "pyrogram=INFO,pytgcalls=INFO")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_MB", 10)) * 1024 * 1024
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", 5))
+LOG_TAIL_LINES = 500
+TAIL_BLOCK_SIZE = 64 * 1024
+# Upper bound on an exported time window (uncompressed); gzip shrinks it ~10x.
+EXPORT_MAX_BYTES = 20 * 1024 * 1024
+
+
+def _gzip_namer(name):
+    return name + ".gz"
+
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def parse_levels(spec):
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(start=True):
+    # Handlers on the event loop thread only enqueue records; a listener thread
+    # does the formatting, disk writes and gzip rotation. With start=False the
+    # caller starts that thread later (start_listener); records queue up until then.
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"
+    )
+    file_handler.namer = _gzip_namer
+    file_handler.rotator = _gzip_rotator
+    formatter = logging.Formatter(LOG_FORMAT)
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, stream_handler, respect_handler_level=True
+    )
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    if start:
+        start_listener(listener)
+    return listener
+
+
+def start_listener(listener):
+    listener.start()
+    atexit.register(listener.stop)
+
+
+def _read_tail(path, lines):
+    # Read backwards in blocks so a large log costs O(lines), not O(file size).
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        while position > 0 and data.count(b"\n") <= lines:
+            step = min(TAIL_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    return data.decode("utf-8", errors="replace").splitlines()[-lines:]
+
+
+def _log_files(path):
+    # The live log, then its rotated backups from newest to oldest.
+    yield path
+    for index in range(1, LOG_BACKUPS + 1):
+        backup = _gzip_namer(f"{path}.{index}")
+        if not os.path.exists(backup):
+            break
+        yield backup
+
+
+def _reverse_lines(path):
+    # Lines from the end of the file backwards. Backups are gzip (no cheap
+    # backwards seeking) and capped at LOG_MAX_BYTES, so they are read whole.
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            yield from reversed(f.read().split(b"\n"))
+        return
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        rest = b""
+        while position > 0:
+            step = min(TAIL_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            lines = (f.read(step) + rest).split(b"\n")
+            rest = lines.pop(0)
+            yield from reversed(lines)
+        yield rest
+
+
+def _read_since(path, minutes, max_bytes=EXPORT_MAX_BYTES):
+    # Every record newer than the cutoff, across rotated files, newest first
+    # while reading; stops at the first older record or at max_bytes.
+    cutoff = datetime.now() - timedelta(minutes=minutes)
+    selected = []
+    record = []  # continuation lines (tracebacks) are met before their record line
+    size = 0
+    for name in _log_files(path):
+        for raw in _reverse_lines(name):
+            if not raw:
+                continue
+            line = raw.decode("utf-8", errors="replace")
+            record.append(line)
+            try:
+                stamp = datetime.strptime(line[:19], "%Y-%m-%d %H:%M:%S")
+            except ValueError:
+                continue
+            size += sum(len(item) + 1 for item in record)
+            if stamp < cutoff or size > max_bytes:
+                return selected[::-1]
+            selected.extend(record)
+            record = []
+    return selected[::-1]
+
+
+def export_log_tail(lines=LOG_TAIL_LINES, minutes=None, path=LOG_FILE):
+    # Returns a gzip-compressed file object ready for send_document(). With
+    # `minutes` the whole window is exported (up to EXPORT_MAX_BYTES) and
+    # `lines` is ignored.
+    if minutes is not None:
+        tail = _read_since(path, minutes)
+    else:
+        tail = _read_tail(path, lines)
+    buffer = io.BytesIO(gzip.compress("\n".join(tail).encode("utf-8")))
+    buffer.name = f"rolavibe-{datetime.now():%Y%m%d-%H%M%S}.log.gz"
+    return buffer, len(tail)
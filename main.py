@@ -3,63 +3,127 @@ import logging
 import asyncio
 import json
 import os
+import time
 from pyrogram import Client, filters, idle
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from pyrogram.errors import MessageNotModified
 from pytgcalls import PyTgCalls
-from pytgcalls.types import StreamType
 from pytgcalls.types.input_stream import AudioPiped
-import yt_dlp as youtube_dl
-from yt_dlp.utils import DownloadError
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
 import aiofiles
 from config import API_ID, API_HASH, BOT_TOKEN, OWNER_ID, SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET
 
 # ✅ Keep Alive Server
 from keep_alive import keep_alive
-keep_alive()
-
-# ✅ Logging Setup
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("rolavibe.log"), logging.StreamHandler()]
+from log_setup import setup_logging, start_listener, export_log_tail, LOG_TAIL_LINES
+from metrics import registry, timed
+from tracing import span, detached, format_recent
+from voice_sessions import VoiceSessionManager
+from sharding import ShardCoordinator, StreamSpec, SHARD_COUNT
+from storage import storage
+from queue_store import QueueStore
+from session_store import SessionStore
+from chat_queue import QueueManager, QueueFull, Track
+from playback import PlaybackEngine, PREPARE_AHEAD
+from auth_cache import auth_cache
+from spotify_resolver import SpotifyResolver, parse_collection_url
+from extractor import extractor, ExtractorBusy, ExtractionError
+from media_cache import media_cache
+from radio_relay import radio_relay, PCM_INPUT_PARAMETERS
+from stats import StatsAggregator
+from thumbnails import ThumbnailCache
+from audio_processor import AudioProcessor, MIN_VOLUME, MAX_VOLUME
+from broadcast import ChatRegistry, Broadcaster, message_id_of
+from resolver import (
+    SongResolver, SongNotFound, youtube_url, MAX_DURATION, SEARCH_CANDIDATES,
+    QUERY_PLACEHOLDER
 )
+
+# ✅ Logging Setup (queued writer thread + gzip rotation; the thread starts in prepare_process)
+log_listener = setup_logging(start=False)
 logger = logging.getLogger(__name__)
 
 # ✅ Bot Client
 app = Client("RolaVibeBot", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN)
 call_py = PyTgCalls(app)
+# With SHARD_COUNT > 0 calls run in worker processes, each with its own assistant account
+shards = ShardCoordinator(SHARD_COUNT) if SHARD_COUNT else None
+voice_sessions = VoiceSessionManager(shards or call_py)
+queue_store = QueueStore(storage)
+queues = QueueManager(queue_store)
+session_store = SessionStore(storage)
+chat_registry = ChatRegistry(storage)
+broadcaster = Broadcaster(storage, chat_registry)
+stats = StatsAggregator(storage)
+thumbnails = ThumbnailCache(storage)
+audio = AudioProcessor(storage)
 
 # ✅ Global Variables
-queue = {}
-queue_lock = asyncio.Lock()
-is_call_active = False
+playlist_imports = {}
+PLAYLIST_CONCURRENCY = 3
+PLAYLIST_PROGRESS_INTERVAL = 3
+pytgcalls_started = False
 maintenance_mode = False
 MAINTENANCE_FILE = "maintenance_mode.json"
+FM_CHANNELS_FILE = "fm_channels.json"
 FM_CHANNELS = {
     "Radio Mirchi": "http://example.com/radiomirchi",
     "Red FM": "http://example.com/redfm",
     "Big FM": "http://example.com/bigfm"
 }
 
-# ✅ YouTube-DL Options
-ydl_opts = {
-    'format': 'bestaudio',
-    'quiet': True,
-    'noplaylist': True
-}
+# ✅ Spotify (the client is built during startup, see connect_spotify)
+spotify = SpotifyResolver()
+resolver = SongResolver(spotify, extractor)
+startup_phases = {}
+
+# ✅ Metrics
+def collect_metrics():
+    res = resolver.stats()
+    ext = extractor.stats()
+    media = media_cache.stats()
+    yield ("rolavibe_active_calls", "gauge", "Chats currently in a voice call",
+           [({}, voice_sessions.active_count)])
+    yield ("rolavibe_unique_users", "gauge", "Distinct users seen", [({}, len(stats.users))])
+    yield ("rolavibe_unique_groups", "gauge", "Distinct groups seen", [({}, len(stats.groups))])
+    yield ("rolavibe_plays_total", "counter", "Tracks queued for playback", [({}, stats.total_plays)])
+    yield ("rolavibe_plays_current_hour", "gauge", "Tracks queued this hour", [({}, stats.plays_last_hour())])
+    yield ("rolavibe_average_latency_seconds", "gauge", "Average resolve/join/track change latency", [
+        ({"stage": "resolve"}, stats.average("resolve")),
+        ({"stage": "join"}, stats.average("join")),
+        ({"stage": "change"}, stats.average("change")),
+    ])
+    yield ("rolavibe_queue_length", "gauge", "Queued tracks per chat",
+           [({"chat_id": chat_id}, len(chat_queue)) for chat_id, chat_queue in queues.items()])
+    yield ("rolavibe_resolver_cache_total", "counter", "Song resolver cache lookups", [
+        ({"cache": "metadata", "result": "hit"}, res["metadata_hits"]),
+        ({"cache": "metadata", "result": "miss"}, res["metadata_misses"]),
+        ({"cache": "stream", "result": "hit"}, res["stream_hits"]),
+        ({"cache": "stream", "result": "miss"}, res["stream_misses"]),
+        ({"cache": "spotify", "result": "hit"}, spotify.cache.hits),
+        ({"cache": "spotify", "result": "miss"}, spotify.cache.misses),
+        ({"cache": "media", "result": "hit"}, media["hits"]),
+        ({"cache": "media", "result": "miss"}, media["misses"]),
+        ({"cache": "thumbnail", "result": "hit"}, thumbnails.hits),
+        ({"cache": "thumbnail", "result": "miss"}, thumbnails.misses),
+        ({"cache": "loudness", "result": "hit"}, audio.hits),
+        ({"cache": "loudness", "result": "miss"}, audio.misses),
+    ])
+    yield ("rolavibe_loudness_pending", "gauge", "Tracks waiting for loudness analysis",
+           [({}, len(audio.pending))])
+    yield ("rolavibe_resolver_coalesced_total", "counter", "Lookups that joined an in-flight resolution",
+           [({}, res["coalesced"])])
+    yield ("rolavibe_extractor_queue_depth", "gauge", "Extraction requests admitted to the pool",
+           [({}, ext["queue_depth"])])
+    yield ("rolavibe_extractor_latency_seconds", "gauge", "Recent extraction latency", [
+        ({"quantile": "0.5"}, ext["latency_p50"]),
+        ({"quantile": "0.95"}, ext["latency_p95"]),
+    ])
+    yield ("rolavibe_radio_listeners", "gauge", "Chats tuned in per radio station",
+           [({"station": name}, info["listeners"]) for name, info in radio_relay.stats().items()])
+    yield ("rolavibe_startup_phase_seconds", "gauge", "Time spent in each startup phase",
+           [({"phase": name}, seconds) for name, seconds in startup_phases.items()])
 
-# ✅ Spotify API Initialization
-sp = None
-if SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET:
-    try:
-        sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
-            client_id=SPOTIFY_CLIENT_ID,
-            client_secret=SPOTIFY_CLIENT_SECRET
-        ))
-    except Exception as e:
-        logger.error(f"Spotify API Initialization Error: {e}")
+registry.register_collector(collect_metrics)
 
 # ✅ Helper Functions
 async def load_maintenance_mode():
@@ -78,92 +142,120 @@ async def save_maintenance_mode():
     except Exception as e:
         logger.error(f"❌ Maintenance Mode Save Error: {e}")
 
+async def load_fm_channels():
+    # Optional overrides/extra stations as {"Name": "http://stream-url"}
+    try:
+        async with aiofiles.open(FM_CHANNELS_FILE, "r") as f:
+            data = await f.read()
+            FM_CHANNELS.update(json.loads(data) if data else {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
 async def ensure_files_exist():
-    files = ["queue.json", "admin_commands.json", "allowed_groups.json"]
+    files = ["admin_commands.json", "allowed_groups.json"]
     for file in files:
         if not os.path.exists(file):
             async with aiofiles.open(file, "w") as f:
                 await f.write(json.dumps({}))
 
 async def load_queue():
-    global queue
     try:
-        async with aiofiles.open("queue.json", "r") as f:
-            data = await f.read()
-            queue = json.loads(data) if data else {}
-    except (FileNotFoundError, json.JSONDecodeError):
-        queue = {}
+        await storage.open()
+        await queue_store.setup()
+        await queues.load()
+    except Exception as e:
+        logger.error(f"❌ Queue Load Error: {e}")
+
+async def enqueue_track(chat_id, track):
+    # False when the chat's queue is already at QUEUE_MAX_LENGTH
+    try:
+        await queues.enqueue(chat_id, [track])
+    except QueueFull:
+        return False
+    return True
+
+def requester_name(user):
+    return getattr(user, "first_name", None) or str(user.id)
+
+def format_duration(seconds):
+    seconds = int(seconds or 0)
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+def make_stream(source, ffmpeg_parameters=""):
+    if shards:
+        return StreamSpec(source, ffmpeg_parameters)
+    return AudioPiped(source, additional_ffmpeg_parameters=ffmpeg_parameters)
 
-async def save_queue():
+engine = PlaybackEngine(queues, voice_sessions, resolver, media_cache, audio, make_stream, stats)
+
+async def start_playback(chat_id):
+    # Joins the call with the head of the queue and returns the track that
+    # started (a failing head is skipped); the engine takes it from there
+    return await engine.start(chat_id)
+
+async def collect_sessions():
+    # Radio chats are not snapshotted: their stream is a live relay, not a queue
+    return await engine.snapshot(skip=radio_relay.station_of)
+
+async def restore_sessions():
+    # Rejoin the calls that were playing when the previous run stopped
     try:
-        async with aiofiles.open("queue.json", "w") as f:
-            await f.write(json.dumps(queue))
+        snapshots = await session_store.load()
+        if snapshots:
+            resumed = await engine.restore(snapshots)
+            logger.info(f"✅ Resumed {resumed}/{len(snapshots)} voice chats")
     except Exception as e:
-        logger.error(f"❌ Queue Save Error: {e}")
+        logger.error(f"❌ Session Restore Error: {e}")
+    session_store.start(collect_sessions)
+
+def schedule_prefetch(chat_id):
+    for track in queues.upcoming(chat_id, PREPARE_AHEAD):
+        if track.id not in ("video", QUERY_PLACEHOLDER):
+            thumbnails.prefetch(track.id)
+    engine.prefetch(chat_id)
 
 async def auto_save():
     while True:
         await asyncio.sleep(120)
         try:
-            await save_queue()
             await save_maintenance_mode()
         except Exception as e:
             logger.error(f"❌ Auto-Save Error: {e}")
 
 async def is_admin_and_allowed(chat_id, user_id, command):
     try:
-        member = await app.get_chat_member(chat_id, user_id)
-        if member.status not in ["administrator", "creator"]:
+        if not auth_cache.is_command_allowed(command):
             return False
-        async with aiofiles.open("admin_commands.json", "r") as f:
-            data = json.loads(await f.read())
-            return command in data.get("allowed_admin_commands", [])
+        status = await auth_cache.get_member_status(app, chat_id, user_id)
+        # "creator" in pyrogram 1, "owner" in pyrogram 2
+        return status in ["administrator", "creator", "owner"]
     except Exception as e:
         logger.error(f"Admin Check Error: {e}")
         return False
 
-async def get_youtube_video(query):
-    loop = asyncio.get_event_loop()
-    try:
-        with youtube_dl.YoutubeDL(ydl_opts) as ydl:
-            return await loop.run_in_executor(None, lambda: ydl.extract_info(f"ytsearch:{query}", download=False))
-    except Exception as e:
-        logger.error(f"❌ YouTube Search Error: {e}")
-        return None
-
-def get_spotify_song_details(query):
-    try:
-        if not sp:
-            return None
-        results = sp.search(q=query, limit=1)
-        if results["tracks"]["items"]:
-            track = results["tracks"]["items"][0]
-            return {
-                "title": track["name"],
-                "artist": track["artists"][0]["name"],
-                "url": track["external_urls"]["spotify"]
-            }
-        return None
-    except Exception as e:
-        logger.error(f"❌ Spotify API Error: {e}")
-        return None
-
-def get_thumbnail(video_id):
-    return f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg"
+def chat_type_of(chat):
+    # pyrogram 2 uses a ChatType enum, pyrogram 1 plain strings
+    return str(getattr(chat.type, "value", chat.type))
 
 async def is_group_allowed(chat_id):
-    try:
-        async with aiofiles.open("allowed_groups.json", "r") as f:
-            data = await f.read()
-            allowed_groups = json.loads(data) if data else {}
-            return str(chat_id) in allowed_groups
-    except (FileNotFoundError, json.JSONDecodeError):
-        return False
+    return auth_cache.is_group_allowed(chat_id)
+
+# ✅ Chat Registry (runs before every other handler)
+@app.on_message(group=-1)
+async def track_chat(client, message: Message):
+    if message.chat:
+        chat_type = chat_type_of(message.chat)
+        chat_registry.seen(message.chat.id, chat_type)
+        if chat_type in ("group", "supergroup"):
+            stats.record_group(message.chat.id)
+    if message.from_user:
+        stats.record_user(message.from_user.id)
 
 # ✅ Commands
 @app.on_message(filters.command("start"))
+@timed("start")
 async def start(client, message: Message):
-    if message.chat.type == "supergroup" and not await is_group_allowed(message.chat.id):
+    if chat_type_of(message.chat) == "supergroup" and not await is_group_allowed(message.chat.id):
         return await message.reply_text("⚠️ This group is not authorized to use the bot. Please contact the bot owner.")
 
     if maintenance_mode and message.from_user.id != OWNER_ID:
@@ -194,6 +286,7 @@ async def start(client, message: Message):
 
 # ✅ Help Command (Admin and Owner Commands Info)
 @app.on_message(filters.command("help"))
+@timed("help")
 async def help_command(client, message: Message):
     help_text = (
         "✨ **Rola Vibe Bot Help Menu** ✨\n\n"
@@ -202,15 +295,21 @@ async def help_command(client, message: Message):
         "▫️ .help - Ye help menu dekhein.\n\n"
         "🔧 **Admin Commands:**\n"
         "▫️ .play <song_name> - Song play karein (Admin only).\n"
+        "▫️ .search <song_name> - Top results mein se song chunein (Admin only).\n"
+        "▫️ .playlist <spotify_link> - Poori Spotify playlist/album queue karein (Admin only).\n"
         "▫️ .stop - Playback stop karein (Admin only).\n"
         "▫️ .pause - Playback pause karein (Admin only).\n"
         "▫️ .resume - Playback resume karein (Admin only).\n"
-        "▫️ .skip - Agla song play karein (Admin only).\n\n"
+        "▫️ .skip [n] - Agla (ya n songs aage ka) song play karein (Admin only).\n"
+        "▫️ .volume [10-200] - Group ka volume set karein (Admin only).\n\n"
         "👑 **Owner Commands:**\n"
         "▫️ .enableadmin <command> - Admin command enable karein.\n"
         "▫️ .disableadmin <command> - Admin command disable karein.\n"
         "▫️ .playvideo <video_url> - Video play karein (Owner only).\n"
-        "▫️ .addgroup - Group ko bot mein add karein (Owner only).\n\n"
+        "▫️ .addgroup - Group ko bot mein add karein (Owner only).\n"
+        "▫️ .logs [lines] [30m] - Latest logs gzip mein paayein (Owner only).\n"
+        "▫️ .slowtraces [count] - Slow requests aur event loop stalls dekhein (Owner only).\n"
+        "▫️ .broadcast - Reply karke message sabhi chats ko bhejein (Owner only).\n\n"
         "📌 *Note:* Admin commands sirf group admins aur bot owner use kar sakte hain.\n"
         "🎧 *Enjoy the Rola Vibe!* 🎶"
     )
@@ -225,18 +324,22 @@ async def help_command(client, message: Message):
 
 # 🎵 Play/Rola Command (Admin Check)
 @app.on_message(filters.command(["play", "rola"], prefixes=".") & filters.group)
+@timed("play")
 async def play_rola_command(client, message: Message):
-    if not await is_group_allowed(message.chat.id):
+    with span("group_check"):
+        allowed = await is_group_allowed(message.chat.id)
+    if not allowed:
         return await message.reply_text("⚠️ This group is not authorized to use the bot. Please contact the bot owner.")
 
-    global is_call_active
     chat_id = message.chat.id
     user = message.from_user
 
     if maintenance_mode and user.id != OWNER_ID:
         return await message.reply_text("⚠️ Bot is currently under maintenance. Please try again later.")
 
-    if not await is_admin_and_allowed(chat_id, user.id, "play"):
+    with span("admin_check"):
+        allowed = await is_admin_and_allowed(chat_id, user.id, "play")
+    if not allowed:
         return await message.reply_text("⚠️ *Only admins can use this command!*")
 
     query = " ".join(message.command[1:]) if len(message.command) > 1 else None
@@ -247,128 +350,536 @@ async def play_rola_command(client, message: Message):
     searching_msg = await message.reply_text("🔍 *Searching...*")
 
     try:
-        # Fetch song details from Spotify
-        spotify_song = get_spotify_song_details(query)
-        if not spotify_song:
-            return await searching_msg.edit("⚠️ *No results found on Spotify. Please try another name.*")
-
-        # Search YouTube for the song
-        info = await get_youtube_video(f"{spotify_song['title']} {spotify_song['artist']}")
-        if "entries" in info and len(info["entries"]) > 0:
-            video = info["entries"][0]
-        else:
-            raise DownloadError("No results found.")
-            
-        video_url = video["url"]
+        # Spotify -> YouTube resolution (cached and shared across chats)
+        started = time.monotonic()
+        with span("resolve"):
+            video = await resolver.resolve(query)
+        stats.observe("resolve", time.monotonic() - started)
+
         title = video["title"]
-        video_id = video["id"]
+        video_id = video["video_id"]
         duration = video["duration"]
 
-        # Check song duration
-        if duration > 600:  # 10 minutes
+        # Check song duration (known from the flat search, before any stream extraction)
+        if duration > MAX_DURATION:  # 10 minutes
             return await searching_msg.edit("⚠️ *Song is too long. Maximum allowed duration is 10 minutes.*")
-    except DownloadError:
+    except SongNotFound as e:
+        return await searching_msg.edit(f"⚠️ *No results found on {e.source}. Please try another name.*")
+    except ExtractionError:
         return await searching_msg.edit("⚠️ *No results found. Please try another name.*")
+    except ExtractorBusy:
+        return await searching_msg.edit("⚠️ *Bot is busy right now. Please try again in a moment.*")
     except Exception as e:
         logger.error(f"Play Command Error: {e}")
         return await searching_msg.edit("⚠️ *An error occurred. Please try again later.*")
 
     await searching_msg.delete()
+    # Fetch the thumbnail while we join the call
+    thumbnails.prefetch(video_id)
 
     # Add song to queue
-    async with queue_lock:
-        queue.setdefault(chat_id, []).append((video_url, title, video_id))
-        await save_queue()
-
-    # Join voice call if not already joined
-    if not is_call_active:
-        await call_py.join_group_call(
-            chat_id,
-            AudioPiped(video_url, stream_type=StreamType().pulse_stream)
+    with span("enqueue"):
+        queued = await enqueue_track(
+            chat_id, Track(video_id, youtube_url(video_id), title, duration, requester_name(user))
         )
-        is_call_active = True
+    if not queued:
+        return await message.reply_text("⚠️ *Queue is full. Please wait for some songs to finish.*")
+    stats.record_play(video_id, title)
+
+    # Join this chat's voice call if not already joined (the stream is extracted here)
+    with span("playback"):
+        try:
+            playing = await start_playback(chat_id)
+        except ExtractionError:
+            return await message.reply_text("⚠️ *Could not stream this song. Please try another name.*")
+        except ExtractorBusy:
+            return await message.reply_text("⚠️ *Bot is busy right now. Please try again in a moment.*")
+        except Exception as e:
+            logger.error(f"Play Command Error: {e}")
+            return await message.reply_text("⚠️ *An error occurred. Please try again later.*")
+    if not playing:
+        schedule_prefetch(chat_id)
+        return await message.reply_text(f"📌 **Added to Queue:** `{title}`")
 
     # Send now playing message with Expand option
-    await message.reply_photo(
-        photo=get_thumbnail(video_id),
-        caption=f"🎵 **Now Playing:** `{title}`\n"
-                f"🔗 [Watch on YouTube](https://youtu.be/{video_id})\n\n"
-                "🎧 *Enjoy the Rola Vibe!*",
-        reply_markup=InlineKeyboardMarkup([
-            [InlineKeyboardButton("⏸️ Pause", callback_data="pause"),
-             InlineKeyboardButton("▶️ Resume", callback_data="resume"),
-             InlineKeyboardButton("⏭️ Skip", callback_data="skip"),
-             InlineKeyboardButton("⏹️ Stop", callback_data="stop")],
-            [InlineKeyboardButton("🔍 Expand", callback_data="expand")]
-        ])
+    with span("reply_photo"):
+        await send_now_playing(message, playing)
+
+def now_playing_caption(title, video_id, page_url=None):
+    if video_id == "video":
+        return (f"🎥 **Now Playing Video:** `{title}`\n"
+                f"🔗 [Watch Video]({page_url})\n\n"
+                "🎧 *Enjoy the Rola Vibe!*")
+    return (f"🎵 **Now Playing:** `{title}`\n"
+            f"🔗 [Watch on YouTube](https://youtu.be/{video_id})\n\n"
+            "🎧 *Enjoy the Rola Vibe!*")
+
+def player_keyboard(toggle="expand"):
+    label = "🔍 Expand" if toggle == "expand" else "⏏️ Collapse"
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("⏸️ Pause", callback_data="pause"),
+         InlineKeyboardButton("▶️ Resume", callback_data="resume"),
+         InlineKeyboardButton("⏭️ Skip", callback_data="skip"),
+         InlineKeyboardButton("⏹️ Stop", callback_data="stop")],
+        [InlineKeyboardButton(label, callback_data=toggle)]
+    ])
+
+async def send_now_playing(message, track):
+    caption = now_playing_caption(track.title, track.id, track.url)
+    sent = None
+    if track.id != "video":
+        sent = await thumbnails.reply_photo(message, track.id, caption=caption, reply_markup=player_keyboard())
+    if sent is None:
+        await message.reply_text(caption, reply_markup=player_keyboard())
+
+# 🔍 Search Command: pick from the top results (Admin Check)
+@app.on_message(filters.command("search", prefixes=".") & filters.group)
+@timed("search")
+async def search_command(client, message: Message):
+    chat_id = message.chat.id
+    user = message.from_user
+
+    if not await is_group_allowed(chat_id):
+        return await message.reply_text("⚠️ This group is not authorized to use the bot. Please contact the bot owner.")
+    if maintenance_mode and user.id != OWNER_ID:
+        return await message.reply_text("⚠️ Bot is currently under maintenance. Please try again later.")
+    with span("admin_check"):
+        allowed = await is_admin_and_allowed(chat_id, user.id, "play")
+    if not allowed:
+        return await message.reply_text("⚠️ *Only admins can use this command!*")
+
+    query = " ".join(message.command[1:]) if len(message.command) > 1 else None
+    if not query:
+        return await message.reply_text("⚠️ *Please provide a song name!*")
+
+    try:
+        # Flat search only: nothing is extracted until a result is picked
+        with span("search"):
+            results = await resolver.search(query, SEARCH_CANDIDATES)
+    except ExtractorBusy:
+        return await message.reply_text("⚠️ *Bot is busy right now. Please try again in a moment.*")
+    except Exception as e:
+        logger.error(f"Search Command Error: {e}")
+        return await message.reply_text("⚠️ *An error occurred. Please try again later.*")
+
+    playable = [video for video in results if video["duration"] <= MAX_DURATION]
+    if not playable:
+        return await message.reply_text("⚠️ *No results found. Please try another name.*")
+
+    keyboard = [
+        [InlineKeyboardButton(
+            f"🎵 {video['title'][:40]} ({format_duration(video['duration'])})",
+            callback_data=f"pick_{video['video_id']}"
+        )]
+        for video in playable
+    ]
+    keyboard.append([InlineKeyboardButton("❌ Close", callback_data="search_close")])
+    with span("reply"):
+        await message.reply_text(
+            f"🔍 **Results for:** `{query}`\n\nTap a song to play it.",
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+
+# 🔍 Search Result Picked
+@app.on_callback_query(filters.regex(r"^pick_(.+)$"))
+@timed("pick")
+async def search_pick_callback(client, callback_query):
+    chat_id = callback_query.message.chat.id
+    user = callback_query.from_user
+
+    if not await is_group_allowed(chat_id):
+        return await callback_query.answer("⚠️ This group is not authorized to use the bot.", show_alert=True)
+    if user.id != OWNER_ID and not await is_admin_and_allowed(chat_id, user.id, "play"):
+        return await callback_query.answer("⚠️ Only admins can use this command!", show_alert=True)
+
+    video = resolver.candidate(callback_query.matches[0].group(1))
+    if video is None:
+        return await callback_query.answer("⚠️ This search has expired. Please search again.", show_alert=True)
+
+    title, video_id = video["title"], video["video_id"]
+    track = Track(video_id, youtube_url(video_id), title, video["duration"], requester_name(user))
+    with span("enqueue"):
+        queued = await enqueue_track(chat_id, track)
+    if not queued:
+        return await callback_query.answer("⚠️ Queue is full. Please wait for some songs to finish.", show_alert=True)
+    stats.record_play(video_id, title)
+    await callback_query.answer(f"🎵 {title[:50]}")
+
+    # The single full extraction happens here, for the chosen video only
+    with span("playback"):
+        try:
+            playing = await start_playback(chat_id)
+        except Exception as e:
+            logger.error(f"Search Play Error: {e}")
+            return await callback_query.edit_message_text("⚠️ *An error occurred. Please try again later.*")
+    if not playing:
+        schedule_prefetch(chat_id)
+        return await callback_query.edit_message_text(f"📌 **Added to Queue:** `{title}`")
+
+    with span("reply_photo"):
+        await send_now_playing(callback_query.message, playing)
+    await callback_query.message.delete()
+
+# 🔍 Close Search Results
+@app.on_callback_query(filters.regex("^search_close$"))
+async def search_close_callback(client, callback_query):
+    await callback_query.message.delete()
+
+# 📥 Playlist Command: queue a whole Spotify playlist or album (Admin Check)
+@app.on_message(filters.command("playlist", prefixes=".") & filters.group)
+@timed("playlist")
+async def playlist_command(client, message: Message):
+    chat_id = message.chat.id
+    user = message.from_user
+
+    if not await is_group_allowed(chat_id):
+        return await message.reply_text("⚠️ This group is not authorized to use the bot. Please contact the bot owner.")
+    if maintenance_mode and user.id != OWNER_ID:
+        return await message.reply_text("⚠️ Bot is currently under maintenance. Please try again later.")
+    with span("admin_check"):
+        allowed = await is_admin_and_allowed(chat_id, user.id, "play")
+    if not allowed:
+        return await message.reply_text("⚠️ *Only admins can use this command!*")
+    if not spotify.enabled:
+        return await message.reply_text("⚠️ *Spotify is not configured on this bot.*")
+
+    collection = parse_collection_url(message.command[1]) if len(message.command) > 1 else None
+    if not collection:
+        return await message.reply_text("⚠️ *Please provide a Spotify playlist or album link!*")
+    task = playlist_imports.get(chat_id)
+    if task and not task.done():
+        return await message.reply_text("⚠️ *A playlist is already being imported here. Please wait.*")
+
+    progress = await message.reply_text("📥 *Fetching playlist...*")
+    try:
+        with span("spotify"):
+            name, tracks = await spotify.collection_tracks(*collection)
+    except Exception as e:
+        logger.error(f"Playlist Fetch Error: {e}")
+        return await progress.edit("⚠️ *Could not read this playlist. Is it public?*")
+
+    # Spotify already knows every duration: drop long tracks before any YouTube work
+    playable = [track for track in tracks if track["duration"] <= MAX_DURATION]
+    if not playable:
+        return await progress.edit("⚠️ *No playable tracks found in this playlist.*")
+
+    # Placeholders carry the search query; they are queued (and visible) right away
+    requester = requester_name(user)
+    placeholders = [
+        Track(QUERY_PLACEHOLDER, f"{track['title']} {track['artist']}", f"{track['title']} - {track['artist']}",
+              track["duration"], requester)
+        for track in playable
+    ]
+    try:
+        with span("enqueue"):
+            placeholders = await queues.enqueue(chat_id, placeholders)
+    except QueueFull:
+        return await progress.edit("⚠️ *Queue is full. Please wait for some songs to finish.*")
+    skipped = len(tracks) - len(placeholders)
+    task = playlist_imports[chat_id] = detached(
+        import_playlist(chat_id, name, placeholders, skipped, progress)
     )
+    task.add_done_callback(lambda t: playlist_imports.pop(chat_id, None) if playlist_imports.get(chat_id) is t else None)
+
+async def import_playlist(chat_id, name, placeholders, skipped, progress):
+    # Resolve placeholders in queue order, a few at a time. Playback starts as
+    # soon as the first track resolves; progress goes into one edited message.
+    slots = asyncio.Semaphore(PLAYLIST_CONCURRENCY)
+    counts = {"resolved": 0, "failed": 0}
+    last_report = 0
+
+    async def report(final=False):
+        nonlocal last_report
+        now = time.monotonic()
+        if not final and now - last_report < PLAYLIST_PROGRESS_INTERVAL:
+            return
+        last_report = now
+        header = "✅ **Playlist queued:**" if final else "📥 **Importing playlist:**"
+        text = (f"{header} `{name}`\n\n"
+                f"🎵 Resolved: `{counts['resolved']}/{len(placeholders)}`\n"
+                f"❌ Not found: `{counts['failed']}`")
+        if skipped:
+            text += f"\n⏭️ Skipped (too long or queue full): `{skipped}`"
+        try:
+            await progress.edit(text)
+        except Exception as e:
+            logger.warning(f"⚠️ Playlist Progress Error: {e}")
+
+    async def resolve(placeholder):
+        async with slots:
+            try:
+                track = await resolver.resolve_track(placeholder)
+            except Exception as e:
+                counts["failed"] += 1
+                logger.warning(f"⚠️ Playlist track not found ({placeholder.title}): {e}")
+                return
+        if await queues.replace(chat_id, placeholder, track):
+            stats.record_play(track.id, track.title)
+        counts["resolved"] += 1
+        await report()
+
+    async def start():
+        # Resolves the head placeholder itself (sharing the lookup with resolve())
+        try:
+            playing = await start_playback(chat_id)
+            if playing:
+                await send_now_playing(progress, playing)
+        except Exception as e:
+            logger.error(f"Playlist Play Error: {e}")
 
-# ✅ Expand Callback
+    await report(final=False)
+    await asyncio.gather(start(), *(resolve(placeholder) for placeholder in placeholders))
+    schedule_prefetch(chat_id)
+    await report(final=True)
+
+async def edit_player_message(callback_query, text, reply_markup):
+    # Now-playing messages are photos (caption) unless the thumbnail failed (text)
+    if getattr(callback_query.message, "photo", None):
+        await callback_query.edit_message_caption(text, reply_markup=reply_markup)
+    else:
+        await callback_query.edit_message_text(text, reply_markup=reply_markup)
+
+# ✅ Expand Callback: now playing details and what's up next
 @app.on_callback_query(filters.regex("^expand$"))
 async def expand_callback(client, callback_query):
     chat_id = callback_query.message.chat.id
-    if "content" in queue.get(chat_id, {}):
-        content = queue[chat_id]["content"]
-        await callback_query.edit_message_text(
-            f"🔍 **Expanded Content:**\n\n{content}",
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("⏏️ Collapse", callback_data="collapse")]
-            ])
-        )
-    else:
-        await callback_query.answer("⚠️ No content available to expand.", show_alert=True)
+    chat_queue = queues.get(chat_id)
+    if not chat_queue:
+        return await callback_query.answer("⚠️ Nothing is playing right now.", show_alert=True)
+
+    current = chat_queue.current
+    upcoming = chat_queue.upcoming(10)
+    lines = [
+        f"🎵 **Now Playing:** `{current.title}`",
+        f"⏱ Duration: `{format_duration(current.duration)}`",
+        f"🙋 Requested by: {current.requester or '-'}",
+        "",
+        f"📜 **Up Next** ({len(chat_queue) - 1}):",
+    ]
+    lines += [f"{index}. `{track.title}` ({format_duration(track.duration)})" for index, track in enumerate(upcoming, 1)]
+    if not upcoming:
+        lines.append("   -")
+    elif len(chat_queue) - 1 > len(upcoming):
+        lines.append(f"…and {len(chat_queue) - 1 - len(upcoming)} more")
+    await edit_player_message(callback_query, "\n".join(lines), player_keyboard("collapse"))
 
 # ✅ Collapse Callback
 @app.on_callback_query(filters.regex("^collapse$"))
 async def collapse_callback(client, callback_query):
-    await callback_query.edit_message_text("Content collapsed.")
+    current = queues.current(callback_query.message.chat.id)
+    if current is None:
+        return await callback_query.answer("⚠️ Nothing is playing right now.", show_alert=True)
+    await edit_player_message(
+        callback_query, now_playing_caption(current.title, current.id, current.url), player_keyboard()
+    )
 
 # 🎵 Stop Command (Admin Check)
 @app.on_message(filters.command("stop", prefixes=".") & filters.group)
+@timed("stop")
 async def stop(client, message: Message):
-    global is_call_active
     chat_id = message.chat.id
     user = message.from_user
 
     if not await is_admin_and_allowed(chat_id, user.id, "stop"):
         return await message.reply_text("⚠️ *Only admins can use this command!*")
 
-    async with queue_lock:
-        queue.pop(chat_id, None)
-        await save_queue()
-
-    if is_call_active:
-        await call_py.leave_group_call(chat_id)
-        is_call_active = False
+    await stop_chat(chat_id)
     await message.reply_text("🛑 *Playback stopped.*")
 
+async def stop_chat(chat_id):
+    importing = playlist_imports.pop(chat_id, None)
+    if importing:
+        importing.cancel()
+    radio_relay.unsubscribe(chat_id)
+    await engine.stop(chat_id)
+
+# ⏸️ Pause / ▶️ Resume / ⏭️ Skip Commands (Admin Check)
+@app.on_message(filters.command("pause", prefixes=".") & filters.group)
+@timed("pause")
+async def pause_command(client, message: Message):
+    if not await is_admin_and_allowed(message.chat.id, message.from_user.id, "pause"):
+        return await message.reply_text("⚠️ *Only admins can use this command!*")
+    if await engine.pause(message.chat.id):
+        return await message.reply_text("⏸️ *Playback paused.*")
+    await message.reply_text("⚠️ *Nothing is playing right now.*")
+
+@app.on_message(filters.command("resume", prefixes=".") & filters.group)
+@timed("resume")
+async def resume_command(client, message: Message):
+    if not await is_admin_and_allowed(message.chat.id, message.from_user.id, "resume"):
+        return await message.reply_text("⚠️ *Only admins can use this command!*")
+    if await engine.resume(message.chat.id):
+        return await message.reply_text("▶️ *Playback resumed.*")
+    await message.reply_text("⚠️ *Playback is not paused.*")
+
+@app.on_message(filters.command("skip", prefixes=".") & filters.group)
+@timed("skip")
+async def skip_command(client, message: Message):
+    chat_id = message.chat.id
+    if not await is_admin_and_allowed(chat_id, message.from_user.id, "skip"):
+        return await message.reply_text("⚠️ *Only admins can use this command!*")
+    if not voice_sessions.is_active(chat_id) or radio_relay.station_of(chat_id):
+        return await message.reply_text("⚠️ *Nothing is playing right now.*")
+    # .skip 3 drops the current track and the next two
+    count = int(message.command[1]) if len(message.command) > 1 and message.command[1].isdigit() else 1
+    # The next track is announced by announce_track
+    if await engine.skip(chat_id, max(1, count)) is None:
+        await message.reply_text("⏹️ *Queue finished. Leaving the voice chat.*")
+
+# ⏸️ Player Buttons: Pause / Resume / Skip / Stop
+@app.on_callback_query(filters.regex("^(pause|resume|skip|stop)$"))
+@timed("player")
+async def player_callback(client, callback_query):
+    chat_id = callback_query.message.chat.id
+    action = callback_query.data
+    with span("admin_check"):
+        allowed = await is_admin_and_allowed(chat_id, callback_query.from_user.id, action)
+    if not allowed:
+        return await callback_query.answer("⚠️ Only admins can use this command!", show_alert=True)
+
+    with span(action):
+        if action == "pause":
+            done = await engine.pause(chat_id)
+            text = "⏸️ Paused." if done else "⚠️ Nothing is playing."
+        elif action == "resume":
+            done = await engine.resume(chat_id)
+            text = "▶️ Resumed." if done else "⚠️ Playback is not paused."
+        elif action == "skip":
+            if not voice_sessions.is_active(chat_id) or radio_relay.station_of(chat_id):
+                text = "⚠️ Nothing is playing."
+            else:
+                text = "⏭️ Skipped." if await engine.skip(chat_id) else "⏹️ Queue finished."
+        else:
+            await stop_chat(chat_id)
+            text = "🛑 Playback stopped."
+    await callback_query.answer(text)
+
+# 🔊 Volume: .volume [10-200] and the Volume button
+VOLUME_STEP = 10
+
+def volume_keyboard(volume):
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("🔉 -10", callback_data=f"volume_{max(MIN_VOLUME, volume - VOLUME_STEP)}"),
+         InlineKeyboardButton(f"🔊 {volume}%", callback_data="volume_control"),
+         InlineKeyboardButton("🔊 +10", callback_data=f"volume_{min(MAX_VOLUME, volume + VOLUME_STEP)}")],
+        [InlineKeyboardButton("50%", callback_data="volume_50"),
+         InlineKeyboardButton("100%", callback_data="volume_100"),
+         InlineKeyboardButton("150%", callback_data="volume_150")],
+    ])
+
+async def apply_volume(chat_id, volume):
+    volume = await audio.set_volume(chat_id, volume)
+    # Radio picks the new volume up the next time it is tuned in
+    if not radio_relay.station_of(chat_id):
+        try:
+            await engine.reapply(chat_id)
+        except Exception as e:
+            logger.error(f"❌ Volume Apply Error ({chat_id}): {e}")
+    return volume
+
+@app.on_message(filters.command("volume", prefixes=".") & filters.group)
+@timed("volume")
+async def volume_command(client, message: Message):
+    chat_id = message.chat.id
+    if not await is_admin_and_allowed(chat_id, message.from_user.id, "volume"):
+        return await message.reply_text("⚠️ *Only admins can use this command!*")
+    if len(message.command) < 2:
+        volume = audio.volume(chat_id)
+        return await message.reply_text(f"🔊 *Volume:* `{volume}%`", reply_markup=volume_keyboard(volume))
+    if not message.command[1].isdigit():
+        return await message.reply_text(f"⚠️ *Usage:* `.volume {MIN_VOLUME}-{MAX_VOLUME}`")
+    volume = await apply_volume(chat_id, int(message.command[1]))
+    await message.reply_text(f"🔊 *Volume set to* `{volume}%`", reply_markup=volume_keyboard(volume))
+
+@app.on_callback_query(filters.regex(r"^volume_(control|\d+)$"))
+@timed("volume_button")
+async def volume_callback(client, callback_query):
+    chat = callback_query.message.chat
+    if chat_type_of(chat) not in ("group", "supergroup"):
+        return await callback_query.answer("⚠️ Volume works only in groups.", show_alert=True)
+    if not await is_admin_and_allowed(chat.id, callback_query.from_user.id, "volume"):
+        return await callback_query.answer("⚠️ Only admins can use this command!", show_alert=True)
+
+    choice = callback_query.matches[0].group(1)
+    if choice == "control":
+        volume = audio.volume(chat.id)
+    else:
+        with span("apply_volume"):
+            volume = await apply_volume(chat.id, int(choice))
+    await callback_query.answer(f"🔊 Volume: {volume}%")
+    try:
+        await edit_player_message(callback_query, f"🔊 **Volume:** `{volume}%`", volume_keyboard(volume))
+    except MessageNotModified:
+        pass  # already showing this volume (e.g. +10 at the maximum)
+
+# ✅ Playback Events (stream end, call closed, kicked)
+async def announce_track(chat_id, track):
+    caption = now_playing_caption(track.title, track.id, track.url)
+    sent = None
+    if track.id != "video":
+        sent = await thumbnails.send_photo(app, chat_id, track.id, caption=caption, reply_markup=player_keyboard())
+    if sent is None:
+        await app.send_message(chat_id, caption, reply_markup=player_keyboard())
+    schedule_prefetch(chat_id)
+
+engine.announce = announce_track
+
+async def stream_end_handler(_, update):
+    chat_id = update.chat_id
+    if radio_relay.station_of(chat_id):
+        return  # radio FIFOs are reconnected by the relay, never advanced
+    try:
+        await engine.stream_ended(chat_id)
+    except Exception as e:
+        logger.error(f"❌ Stream End Error ({chat_id}): {e}")
+
+async def call_closed_handler(_, update):
+    # pytgcalls passes the chat id; the shard coordinator passes an update
+    chat_id = getattr(update, "chat_id", update)
+    radio_relay.unsubscribe(chat_id)
+    voice_sessions.mark_idle(chat_id)
+    engine.forget(chat_id)
+
+stream_events = shards or call_py
+stream_events.on_stream_end()(stream_end_handler)
+stream_events.on_closed_voice_chat()(call_closed_handler)
+if not shards:
+    call_py.on_kicked()(call_closed_handler)
+
 # ✅ Owner Commands: Enable/Disable Admin Commands
 @app.on_message(filters.command("enableadmin", prefixes=".") & filters.user(OWNER_ID))
+@timed("enableadmin")
 async def enable_admin_command(client, message: Message):
     cmd = message.text.split(" ", 1)[1].strip()
-    async with aiofiles.open("admin_commands.json", "r+") as f:
-        data = json.loads(await f.read())
-        if cmd not in data["allowed_admin_commands"]:
-            data["allowed_admin_commands"].append(cmd)
-            await f.seek(0)
-            await f.write(json.dumps(data))
-            return await message.reply_text(f"✅ *Admin command `{cmd}` enabled!*")
+    if await auth_cache.enable_command(cmd):
+        return await message.reply_text(f"✅ *Admin command `{cmd}` enabled!*")
 
 @app.on_message(filters.command("disableadmin", prefixes=".") & filters.user(OWNER_ID))
+@timed("disableadmin")
 async def disable_admin_command(client, message: Message):
     cmd = message.text.split(" ", 1)[1].strip()
-    async with aiofiles.open("admin_commands.json", "r+") as f:
-        data = json.loads(await f.read())
-        if cmd in data["allowed_admin_commands"]:
-            data["allowed_admin_commands"].remove(cmd)
-            await f.seek(0)
-            await f.write(json.dumps(data))
-            return await message.reply_text(f"✅ *Admin command `{cmd}` disabled!*")
+    if await auth_cache.disable_command(cmd):
+        return await message.reply_text(f"✅ *Admin command `{cmd}` disabled!*")
+
+# ✅ Owner Command: Authorize Group
+@app.on_message(filters.command("addgroup", prefixes=".") & filters.group & filters.user(OWNER_ID))
+@timed("addgroup")
+async def add_group_command(client, message: Message):
+    if await auth_cache.add_group(message.chat.id, message.chat.title or ""):
+        return await message.reply_text("✅ *Group authorized! Everyone here can now enjoy the Rola Vibe.*")
+    await message.reply_text("ℹ️ *This group is already authorized.*")
+
+# ✅ Drop cached admin status when a member is promoted, demoted or leaves
+@app.on_chat_member_updated()
+async def chat_member_updated(client, update):
+    member = update.new_chat_member or update.old_chat_member
+    if member and member.user:
+        auth_cache.invalidate_member(update.chat.id, member.user.id)
 
 # 🎥 Play Video Command (Owner Only)
 @app.on_message(filters.command("playvideo", prefixes=".") & filters.user(OWNER_ID))
+@timed("playvideo")
 async def play_video_command(client, message: Message):
-    global is_call_active
     chat_id = message.chat.id
     user = message.from_user
 
@@ -377,31 +888,36 @@ async def play_video_command(client, message: Message):
         return await message.reply_text("⚠️ *Only the bot owner can use this command!*")
 
     # Get video URL from command
-    video_url = " ".join(message.command[1:]) if len(message.command) > 1 else None
-    if not video_url:
+    page_url = " ".join(message.command[1:]) if len(message.command) > 1 else None
+    if not page_url:
         return await message.reply_text("⚠️ *Please provide a video URL!*")
 
     await message.delete()
     searching_msg = await message.reply_text("🔍 *Processing video...*")
 
     try:
-        # Use yt-dlp to extract video info
-        loop = asyncio.get_event_loop()
-        with youtube_dl.YoutubeDL(ydl_opts) as ydl:
-            info = await loop.run_in_executor(None, lambda: ydl.extract_info(video_url, download=False))
-            if not info:
-                return await searching_msg.edit("⚠️ *No video found at the provided URL.*")
-
-            video_title = info.get("title", "Unknown Title")
-            video_url = info.get("url")  # Direct video stream URL
-            video_duration = info.get("duration", 0)
-
-            # Check video duration (max 3 hours = 180 minutes = 10800 seconds)
-            if video_duration > 10800:
-                return await searching_msg.edit("⚠️ *Video is too long. Maximum allowed duration is 3 hours.*")
-
-    except DownloadError:
+        # Use the yt-dlp worker pool to extract video info
+        with span("extract"):
+            info = await extractor.extract(page_url)
+        if not info:
+            return await searching_msg.edit("⚠️ *No video found at the provided URL.*")
+
+        video_title = info.get("title", "Unknown Title")
+        # yt-dlp reports floats for many sites and None for livestreams
+        video_duration = int(info.get("duration") or 0)
+
+        # Check video duration (max 3 hours = 180 minutes = 10800 seconds)
+        if video_duration > 10800:
+            return await searching_msg.edit("⚠️ *Video is too long. Maximum allowed duration is 3 hours.*")
+
+        # Remember the direct stream URL until it expires
+        if info.get("url"):
+            resolver.remember_stream(page_url, info["url"])
+
+    except ExtractionError:
         return await searching_msg.edit("⚠️ *Invalid URL or unsupported website.*")
+    except ExtractorBusy:
+        return await searching_msg.edit("⚠️ *Bot is busy right now. Please try again in a moment.*")
     except Exception as e:
         logger.error(f"Video Play Error: {e}")
         return await searching_msg.edit("⚠️ *An error occurred. Please try again later.*")
@@ -409,31 +925,30 @@ async def play_video_command(client, message: Message):
     await searching_msg.delete()
 
     # Add video to queue
-    async with queue_lock:
-        queue.setdefault(chat_id, []).append((video_url, video_title, "video"))
-        await save_queue()
-
-    # Join voice call if not already joined
-    if not is_call_active:
-        await call_py.join_group_call(
-            chat_id,
-            AudioPiped(video_url, stream_type=StreamType().pulse_stream)
-        )
-        is_call_active = True
+    with span("enqueue"):
+        queued = await enqueue_track(chat_id, Track("video", page_url, video_title, video_duration, requester_name(user)))
+    if not queued:
+        return await message.reply_text("⚠️ *Queue is full. Please wait for some songs to finish.*")
+    stats.record_play(page_url, video_title)
+
+    # Join this chat's voice call if not already joined
+    with span("playback"):
+        try:
+            playing = await start_playback(chat_id)
+        except ExtractionError:
+            return await message.reply_text("⚠️ *Could not stream this video.*")
+        except ExtractorBusy:
+            return await message.reply_text("⚠️ *Bot is busy right now. Please try again in a moment.*")
+        except Exception as e:
+            logger.error(f"Video Play Error: {e}")
+            return await message.reply_text("⚠️ *An error occurred. Please try again later.*")
+    if not playing:
+        schedule_prefetch(chat_id)
+        return await message.reply_text(f"📌 **Added to Queue:** `{video_title}`")
 
     # Send now playing message
-    await message.reply_text(
-        f"🎥 **Now Playing Video:** `{video_title}`\n"
-        f"🔗 [Watch Video]({video_url})\n\n"
-        "🎧 *Enjoy the Rola Vibe!*",
-        reply_markup=InlineKeyboardMarkup([
-            [InlineKeyboardButton("⏸️ Pause", callback_data="pause"),
-             InlineKeyboardButton("▶️ Resume", callback_data="resume"),
-             InlineKeyboardButton("⏭️ Skip", callback_data="skip"),
-             InlineKeyboardButton("⏹️ Stop", callback_data="stop")],
-            [InlineKeyboardButton("🔍 Expand", callback_data="expand")]
-        ])
-    )
+    with span("reply"):
+        await send_now_playing(message, playing)
 
 # ✅ Owner Panel Callback
 @app.on_callback_query(filters.regex("^owner_panel$"))
@@ -470,14 +985,26 @@ async def bot_stats_callback(client, callback_query):
         await callback_query.answer("⚠️ Only the bot owner can access this panel!", show_alert=True)
         return
 
-    # ✅ Fetch Bot Stats (Example)
-    total_users = 1000  # Replace with actual logic to fetch stats
-    total_groups = 50   # Replace with actual logic to fetch stats
+    # ✅ Fetch Bot Stats (in-memory aggregates, no file scans)
+    ext = extractor.stats()
+    res = resolver.stats()
+    top = "\n".join(
+        f"   {rank}. `{title}` ({plays})" for rank, (title, plays) in enumerate(stats.top_tracks(), 1)
+    ) or "   -"
 
     await callback_query.edit_message_text(
         f"📊 **Bot Statistics**\n\n"
-        f"👤 Total Users: `{total_users}`\n"
-        f"👥 Total Groups: `{total_groups}`\n\n"
+        f"👤 Total Users: `{len(stats.users)}`\n"
+        f"👥 Total Groups: `{len(stats.groups)}`\n"
+        f"🎧 Active Calls: `{voice_sessions.active_count}`\n"
+        f"▶️ Plays: `{stats.plays_last_hour()}` this hour, `{stats.total_plays}` total\n"
+        f"⏱ Avg Resolve: `{stats.average('resolve'):.2f}s`, Avg Join: `{stats.average('join'):.2f}s`, Avg Change: `{stats.average('change'):.2f}s`\n"
+        f"🔥 Top Tracks:\n{top}\n"
+        f"⚙️ Extractor: `{ext['queue_depth']}/{ext['max_pending']}` queued, "
+        f"p50 `{ext['latency_p50']:.1f}s`, p95 `{ext['latency_p95']:.1f}s`\n"
+        f"🎯 Resolver: `{res['metadata_hits']}` hits / `{res['metadata_misses']}` misses, "
+        f"`{res['stream_hits']}` stream hits, `{res['coalesced']}` coalesced\n"
+        f"🖼 Thumbnails: `{thumbnails.hits}` cached sends / `{thumbnails.misses}` uploads\n\n"
         "🔙 Click the button below to go back.",
         reply_markup=InlineKeyboardMarkup([
             [InlineKeyboardButton("🔙 Back", callback_data="owner_panel")]
@@ -493,15 +1020,56 @@ async def broadcast_callback(client, callback_query):
         await callback_query.answer("⚠️ Only the bot owner can access this panel!", show_alert=True)
         return
 
+    if broadcaster.running:
+        return await callback_query.edit_message_text(
+            f"{broadcaster.job.summary()}\n\n"
+            "🔙 Click the button below to go back.",
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("🔄 Refresh", callback_data="broadcast"),
+                 InlineKeyboardButton("⏹️ Cancel", callback_data="broadcast_cancel")],
+                [InlineKeyboardButton("🔙 Back", callback_data="owner_panel")]
+            ])
+        )
+
     await callback_query.edit_message_text(
         "📢 **Broadcast Message**\n\n"
-        "Send the message you want to broadcast to all users/groups.\n\n"
+        f"Known chats: `{chat_registry.count()}`\n\n"
+        "Reply to the message you want to broadcast with `.broadcast`.\n\n"
         "🔙 Click the button below to go back.",
         reply_markup=InlineKeyboardMarkup([
             [InlineKeyboardButton("🔙 Back", callback_data="owner_panel")]
         ])
     )
 
+# ✅ Broadcast Cancel Callback
+@app.on_callback_query(filters.regex("^broadcast_cancel$"))
+async def broadcast_cancel_callback(client, callback_query):
+    if callback_query.from_user.id != OWNER_ID:
+        return await callback_query.answer("⚠️ Only the bot owner can access this panel!", show_alert=True)
+
+    if await broadcaster.cancel():
+        return await callback_query.answer("🛑 Broadcast cancelled.", show_alert=True)
+    await callback_query.answer("ℹ️ No broadcast is running.", show_alert=True)
+
+# ✅ Owner Command: Broadcast (reply to a message)
+@app.on_message(filters.command("broadcast", prefixes=".") & filters.user(OWNER_ID))
+@timed("broadcast")
+async def broadcast_command(client, message: Message):
+    if not message.reply_to_message:
+        return await message.reply_text("⚠️ *Reply to the message you want to broadcast!*")
+    if broadcaster.running:
+        return await message.reply_text("⚠️ *A broadcast is already running. Check the Owner Panel.*")
+
+    progress = await message.reply_text("📢 *Starting broadcast...*")
+    job = await broadcaster.start(
+        client,
+        message.chat.id,
+        message_id_of(message.reply_to_message),
+        progress.chat.id,
+        message_id_of(progress)
+    )
+    await progress.edit(job.summary())
+
 # ✅ Maintenance Mode Callback
 @app.on_callback_query(filters.regex("^maintenance$"))
 async def maintenance_callback(client, callback_query):
@@ -533,8 +1101,8 @@ async def admin_commands_callback(client, callback_query):
         await callback_query.answer("⚠️ Only the bot owner can access this panel!", show_alert=True)
         return
 
-    # ✅ Fetch Admin Commands (Example)
-    admin_commands = [".play", ".stop", ".pause", ".resume", ".skip"]
+    # ✅ Fetch Admin Commands
+    admin_commands = [f".{cmd}" for cmd in auth_cache.allowed_admin_commands()] or ["None"]
 
     await callback_query.edit_message_text(
         f"🔒 **Admin Commands Management**\n\n"
@@ -555,19 +1123,116 @@ async def check_logs_callback(client, callback_query):
         await callback_query.answer("⚠️ Only the bot owner can access this panel!", show_alert=True)
         return
 
-    # ✅ Send Logs File (Example)
+    # ✅ Send the latest log lines, gzip-compressed
     try:
-        await client.send_document(
-            chat_id=user.id,
-            document="rolavibe.log",
-            caption="📝 **Bot Logs**\n\nHere are the latest logs."
-        )
+        await send_log_tail(client, user.id, LOG_TAIL_LINES)
     except Exception as e:
         logger.error(f"Logs Send Error: {e}")
-        await callback_query.answer("⚠️ Failed to send logs. Please check the log file manually.", show_alert=True)
+        return await callback_query.answer("⚠️ Failed to send logs. Please check the log file manually.", show_alert=True)
 
     await callback_query.answer("Logs sent to your private chat.", show_alert=True)
 
+async def send_log_tail(client, chat_id, lines, minutes=None):
+    loop = asyncio.get_running_loop()
+    document, count = await loop.run_in_executor(None, export_log_tail, lines, minutes)
+    window = f" from the last {minutes} min" if minutes else ""
+    await client.send_document(
+        chat_id=chat_id,
+        document=document,
+        caption=f"📝 **Bot Logs**\n\nLast `{count}` lines{window}."
+    )
+
+# ✅ Owner Command: .logs [lines] [minutes]m
+@app.on_message(filters.command("logs", prefixes=".") & filters.user(OWNER_ID))
+async def logs_command(client, message: Message):
+    lines, minutes = LOG_TAIL_LINES, None
+    for arg in message.command[1:]:
+        if arg.endswith("m") and arg[:-1].isdigit():
+            minutes = int(arg[:-1])
+        elif arg.isdigit():
+            lines = int(arg)
+    try:
+        await send_log_tail(client, message.chat.id, min(lines, 20000), minutes)
+    except Exception as e:
+        logger.error(f"Logs Send Error: {e}")
+        await message.reply_text("⚠️ *Failed to send logs.*")
+
+# ✅ Owner Command: .slowtraces [count]
+@app.on_message(filters.command("slowtraces", prefixes=".") & filters.user(OWNER_ID))
+async def slow_traces_command(client, message: Message):
+    limit = int(message.command[1]) if len(message.command) > 1 and message.command[1].isdigit() else 5
+    report = format_recent(min(limit, 20))
+    if not report:
+        return await message.reply_text("✅ *No slow requests or event loop stalls recorded.*")
+    # Telegram caps messages at 4096 characters; keep the newest part.
+    await message.reply_text(report[-4000:])
+
+@app.on_callback_query(filters.regex("^radio$"))
+async def radio_callback(client, callback_query):
+    stations = list(FM_CHANNELS)
+    keyboard = [
+        [InlineKeyboardButton(f"📻 {name}", callback_data=f"radio_{index}")]
+        for index, name in enumerate(stations)
+    ]
+    keyboard.append([InlineKeyboardButton("⏹️ Stop Radio", callback_data="radio_stop"),
+                     InlineKeyboardButton("🔙 Back", callback_data="back_to_start")])
+
+    await callback_query.edit_message_text(
+        "📻 **FM Radio**\n\n"
+        "Choose a station to stream in this group's voice chat:",
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+
+# 📻 Tune Station Callback
+@app.on_callback_query(filters.regex(r"^radio_(\d+)$"))
+@timed("radio")
+async def radio_station_callback(client, callback_query):
+    chat_id = callback_query.message.chat.id
+    user = callback_query.from_user
+
+    if chat_type_of(callback_query.message.chat) != "supergroup" or not await is_group_allowed(chat_id):
+        return await callback_query.answer("⚠️ Radio works only in authorized groups.", show_alert=True)
+    if user.id != OWNER_ID and not await is_admin_and_allowed(chat_id, user.id, "play"):
+        return await callback_query.answer("⚠️ Only admins can use this command!", show_alert=True)
+
+    stations = list(FM_CHANNELS)
+    index = int(callback_query.matches[0].group(1))
+    if index >= len(stations):
+        return await callback_query.answer("⚠️ Station not found.", show_alert=True)
+    name = stations[index]
+
+    if voice_sessions.is_active(chat_id) and not radio_relay.station_of(chat_id):
+        return await callback_query.answer("⚠️ Stop the current playback first (.stop).", show_alert=True)
+
+    # One shared decoder per station; this chat only gets its own FIFO
+    with span("subscribe"):
+        fifo = await radio_relay.subscribe(name, FM_CHANNELS[name], chat_id)
+    stream = make_stream(fifo, f"{PCM_INPUT_PARAMETERS} {audio.filter_parameters(chat_id)}".strip())
+    try:
+        with span("join_group_call"):
+            if not await voice_sessions.join(chat_id, stream):
+                await voice_sessions.change(chat_id, stream)
+    except Exception as e:
+        radio_relay.unsubscribe(chat_id)
+        logger.error(f"Radio Play Error: {e}")
+        return await callback_query.answer("⚠️ Could not join the voice chat.", show_alert=True)
+
+    await callback_query.answer(f"📻 Tuned in to {name}!")
+
+# 📻 Stop Radio Callback
+@app.on_callback_query(filters.regex("^radio_stop$"))
+async def radio_stop_callback(client, callback_query):
+    chat_id = callback_query.message.chat.id
+    user = callback_query.from_user
+
+    if user.id != OWNER_ID and not await is_admin_and_allowed(chat_id, user.id, "stop"):
+        return await callback_query.answer("⚠️ Only admins can use this command!", show_alert=True)
+    if not radio_relay.unsubscribe(chat_id):
+        return await callback_query.answer("ℹ️ Radio is not playing here.", show_alert=True)
+
+    await voice_sessions.leave(chat_id)
+    await callback_query.answer("🛑 Radio stopped.")
+
 # ✅ Back to Start Callback
 @app.on_callback_query(filters.regex("^back_to_start$"))
 async def back_to_start_callback(client, callback_query):
@@ -596,16 +1261,125 @@ async def back_to_start_callback(client, callback_query):
         reply_markup=keyboard
     )
 
+# 🚀 Startup
+async def timed_phase(name, step):
+    started = time.monotonic()
+    try:
+        return await step
+    finally:
+        startup_phases[name] = time.monotonic() - started
+
+async def connect_spotify():
+    if not (SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET):
+        return
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(spotify.executor, spotify.connect, SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
+    except Exception as e:
+        logger.error(f"Spotify API Initialization Error: {e}")
+
+async def load_local_state():
+    # Files and SQLite only; everything a handler reads before it answers
+    await ensure_files_exist()
+    await asyncio.gather(
+        auth_cache.load(),
+        load_fm_channels(),
+        load_maintenance_mode(),
+        load_queue()
+    )
+    # One SQLite thread: these queue up behind each other, but nothing waits in between
+    await asyncio.gather(
+        chat_registry.load(),
+        stats.load(),
+        thumbnails.load(),
+        audio.start(),
+        session_store.setup()
+    )
+
+async def start_telegram(local_state):
+    # Handlers run as soon as the client is connected, so local state first
+    await local_state
+    await timed_phase("pyrogram", app.start())
+    if shards:
+        await timed_phase("pytgcalls", shards.start())
+    else:
+        await timed_phase("pytgcalls", call_py.start())
+
+async def bootstrap():
+    # Everything between "process started" and "ready to play". Independent
+    # steps overlap: yt_dlp loads inside the extractor workers, spotipy on the
+    # Spotify thread, and the Telegram connection is set up meanwhile.
+    global pytgcalls_started
+    started = time.monotonic()
+    extractor_ready = extractor.spawn()  # already forked by prepare_process()
+    local_state = asyncio.ensure_future(timed_phase("local_state", load_local_state()))
+    await asyncio.gather(
+        local_state,
+        timed_phase("extractor", extractor_ready),
+        timed_phase("media_cache", media_cache.start()),
+        timed_phase("spotify", connect_spotify()),
+        start_telegram(local_state)
+    )
+    queues.start(voice_sessions.is_active)
+    pytgcalls_started = True
+    startup_phases["total"] = time.monotonic() - started
+    breakdown = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in startup_phases.items() if name != "total")
+    logger.info(f"🚀 Ready in {startup_phases['total']:.2f}s [{breakdown}]")
+    return startup_phases
+
+def pytgcalls_running():
+    # Health check: cleared on shutdown; with shards, at least one must be up.
+    if not pytgcalls_started:
+        return False
+    return bool(shards.loads()) if shards else True
+
+def prepare_process():
+    # The extractor workers are forked while this process has no other thread
+    # yet; the log writer, stall watchdog and SQLite threads all start after.
+    extractor.spawn()
+    start_listener(log_listener)
+
 # 🔥 Run Bot
+async def shutdown():
+    # Storage goes last: the steps before it still write (stats, media cache
+    # manifest, pending background writes). One failing step doesn't skip the rest.
+    global pytgcalls_started
+    pytgcalls_started = False
+    steps = [("stats", stats.flush)]
+    if shards:
+        steps.append(("shards", shards.stop))
+    steps += [
+        ("audio", audio.close),
+        ("media cache", media_cache.close),
+        ("extractor", extractor.shutdown),
+        ("storage", storage.close),
+    ]
+    for name, step in steps:
+        try:
+            result = step()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            logger.error(f"❌ Shutdown Error ({name}): {e}")
+
 async def main():
+    prepare_process()
     try:
-        await ensure_files_exist()
-        await load_queue()
-        await load_fm_channels()
-        await load_maintenance_mode()
-        await app.start()
-        await call_py.start()
+        await keep_alive({
+            "pyrogram": lambda: app.is_connected,
+            "pytgcalls": pytgcalls_running
+        })
+        await bootstrap()
+        await broadcaster.resume(app)
+        asyncio.create_task(restore_sessions())
+        # idle() returns on SIGINT/SIGTERM; the final snapshot is written
+        # before anything is torn down so the next start resumes from here.
         await idle()
+        try:
+            await session_store.stop(collect_sessions)
+        except Exception as e:
+            logger.error(f"❌ Session Snapshot Error: {e}")
+        await shutdown()
     except Exception as e:
         logger.error(f"❌ Bot Startup Error: {e}")
 
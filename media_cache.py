@@ -0,0 +1,193 @@
+# media_cache.py
+import asyncio
+import json
+import logging
+import os
+import time
+import aiofiles
+
+logger = logging.getLogger(__name__)
+
+MEDIA_CACHE_ENABLED = os.getenv("MEDIA_CACHE_ENABLED", "0") == "1"
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", "media_cache")
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_MB", 2048)) * 1024 * 1024
+MEDIA_CACHE_WORKERS = int(os.getenv("MEDIA_CACHE_WORKERS", 2))
+MEDIA_CACHE_MAX_PENDING = 100
+MANIFEST_FILE = "manifest.json"
+MANIFEST_SAVE_DELAY = 5
+# A path handed out by path_for() is opened by ffmpeg a moment later; files
+# used this recently are never evicted.
+EVICT_GRACE = 60
+
+# Opus in Ogg at 96 kbit/s: ~7 MB for a 10 minute song, decoded cheaply by ffmpeg.
+FFMPEG_TRANSCODE = ["-vn", "-c:a", "libopus", "-b:a", "96k", "-ar", "48000", "-ac", "2", "-f", "ogg"]
+
+
+class MediaCache:
+    # Songs are downloaded and transcoded once in the background, then served
+    # from disk. Entries are tracked in a manifest so they survive restarts, and
+    # the least recently played files are evicted when the cache grows too big.
+
+    def __init__(self, directory=MEDIA_CACHE_DIR, max_bytes=MEDIA_CACHE_MAX_BYTES,
+                 workers=MEDIA_CACHE_WORKERS, enabled=MEDIA_CACHE_ENABLED):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.enabled = enabled
+        self.entries = {}
+        self.total_bytes = 0
+        self.jobs = asyncio.Queue(maxsize=MEDIA_CACHE_MAX_PENDING)
+        self.pending = set()
+        self.tasks = []
+        self.save_handle = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_FILE)
+
+    def _file(self, video_id):
+        return os.path.join(self.directory, f"{video_id}.ogg")
+
+    async def start(self):
+        if not self.enabled or self.tasks:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        await self._load_manifest()
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"✅ Media cache ready: {len(self.entries)} tracks, {self.total_bytes // (1024 * 1024)} MB")
+
+    async def _load_manifest(self):
+        try:
+            async with aiofiles.open(self.manifest_path, "r") as f:
+                data = await f.read()
+                entries = json.loads(data) if data else {}
+        except (FileNotFoundError, json.JSONDecodeError):
+            entries = {}
+        # Drop entries whose file vanished, and files the manifest doesn't know about.
+        self.entries = {
+            video_id: entry for video_id, entry in entries.items()
+            if os.path.exists(self._file(video_id))
+        }
+        known = {os.path.basename(self._file(video_id)) for video_id in self.entries}
+        for name in os.listdir(self.directory):
+            if name != MANIFEST_FILE and name not in known:
+                os.remove(os.path.join(self.directory, name))
+        self.total_bytes = sum(entry["size"] for entry in self.entries.values())
+
+    async def _save_manifest(self):
+        self.save_handle = None
+        tmp = self.manifest_path + ".tmp"
+        try:
+            async with aiofiles.open(tmp, "w") as f:
+                await f.write(json.dumps(self.entries))
+            os.replace(tmp, self.manifest_path)
+        except Exception as e:
+            logger.error(f"❌ Media Cache Manifest Save Error: {e}")
+
+    def _schedule_save(self):
+        if self.save_handle is None:
+            loop = asyncio.get_running_loop()
+            self.save_handle = loop.call_later(
+                MANIFEST_SAVE_DELAY, lambda: asyncio.ensure_future(self._save_manifest())
+            )
+
+    def path_for(self, video_id):
+        if not self.enabled:
+            return None
+        entry = self.entries.get(video_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry["last_used"] = time.time()
+        self._schedule_save()
+        return self._file(video_id)
+
+    def schedule(self, video_id, stream_url):
+        if not self.enabled or not self.tasks or video_id in self.entries or video_id in self.pending:
+            return False
+        try:
+            self.jobs.put_nowait((video_id, stream_url))
+        except asyncio.QueueFull:
+            return False
+        self.pending.add(video_id)
+        return True
+
+    async def _worker(self):
+        while True:
+            video_id, stream_url = await self.jobs.get()
+            try:
+                await self._download(video_id, stream_url)
+            except Exception as e:
+                logger.error(f"❌ Media Cache Download Error ({video_id}): {e}")
+            finally:
+                self.pending.discard(video_id)
+                self.jobs.task_done()
+
+    async def _download(self, video_id, stream_url):
+        final = self._file(video_id)
+        tmp = final + ".part"
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", stream_url,
+            *FFMPEG_TRANSCODE, tmp,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await process.communicate()
+            if process.returncode != 0:
+                raise RuntimeError(stderr.decode(errors="ignore").strip()[-300:])
+            # Atomic publish: readers only ever see complete files.
+            os.replace(tmp, final)
+        except BaseException:
+            # Failed or cancelled (shutdown): no ffmpeg or partial file left behind.
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        size = os.path.getsize(final)
+        self.entries[video_id] = {"size": size, "last_used": time.time()}
+        self.total_bytes += size
+        self._evict()
+        self._schedule_save()
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        # Files still being played stay readable: the open descriptor outlives unlink.
+        recent = time.time() - EVICT_GRACE
+        for video_id, entry in sorted(self.entries.items(), key=lambda item: item[1]["last_used"]):
+            if self.total_bytes <= self.max_bytes or entry["last_used"] > recent:
+                break
+            try:
+                os.remove(self._file(video_id))
+            except FileNotFoundError:
+                pass
+            self.total_bytes -= entry["size"]
+            del self.entries[video_id]
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        # Let the cancelled downloads kill ffmpeg and remove their partial files.
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.save_handle is not None:
+            self.save_handle.cancel()
+            await self._save_manifest()
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "pending": len(self.pending),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+media_cache = MediaCache()
@@ -0,0 +1,132 @@
+# metrics.py
+import functools
+import time
+import tracing
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, labels, value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        self.values[tuple(sorted(labels.items()))] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.series.get(key)
+        if series is None:
+            # per-bucket counts + [sum, count]
+            series = self.series[key] = [0] * len(self.buckets) + [0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self):
+        for labels, series in self.series.items():
+            for bound, count in zip(self.buckets, series):
+                yield f"{self.name}_bucket", labels + (("le", bound),), count
+            yield f"{self.name}_bucket", labels + (("le", "+Inf"),), series[-1]
+            yield f"{self.name}_sum", labels, series[-2]
+            yield f"{self.name}_count", labels, series[-1]
+
+
+class Registry:
+    # Metrics are plain in-memory numbers; collectors are called at scrape time
+    # for values that already live elsewhere (queue sizes, cache counters, ...).
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help_text):
+        metric = Counter(name, help_text)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help_text):
+        metric = Gauge(name, help_text)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        # collector() -> iterable of (name, kind, help, [(labels_dict, value), ...])
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        for collector in self.collectors:
+            for name, kind, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(sorted(labels.items()))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+command_latency = registry.histogram("rolavibe_command_seconds", "Command handler latency in seconds")
+
+
+def timed(command):
+    # Place below @app.on_message so the registered handler is the timed one.
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.monotonic()
+            try:
+                with tracing.trace(command):
+                    return await func(*args, **kwargs)
+            finally:
+                command_latency.observe(time.monotonic() - started, command=command)
+        return wrapper
+    return decorator
@@ -0,0 +1,300 @@
+# playback.py
+import asyncio
+import contextlib
+import logging
+import time
+from resolver import QUERY_PLACEHOLDER
+from tracing import detached
+from session_store import SessionSnapshot
+from voice_sessions import PAUSED, PLAYING
+
+logger = logging.getLogger(__name__)
+
+PREPARE_AHEAD = 2
+# pytgcalls can still deliver the end of a stream we just replaced; an "end"
+# this soon after a change belongs to the old track and is ignored.
+STREAM_END_GRACE = 2.0
+MAX_SKIP_ON_ERROR = 5
+RESTORE_CONCURRENCY = 5
+# A snapshot this close to the end of its track resumes with the next one.
+RESTORE_TAIL = 5
+
+
+def seek_parameters(position):
+    # Input seeking: ffmpeg skips to the position before decoding anything.
+    return f"-ss {position:.1f}" if position > 0 else ""
+
+
+class PlaybackEngine:
+    # Walks each chat's queue through its voice call. The first track joins the
+    # call; every later one is switched in place with change_stream, never a
+    # leave/rejoin. While a track plays, the next ones are resolved ahead of
+    # time (placeholder -> video, stream URL) so a track change only has to
+    # start ffmpeg on an already known input.
+
+    def __init__(self, queues, voice_sessions, resolver, media_cache, audio, make_stream, stats):
+        self.queues = queues
+        self.voice_sessions = voice_sessions
+        self.resolver = resolver
+        self.media_cache = media_cache
+        self.audio = audio
+        self.make_stream = make_stream
+        self.stats = stats
+        self.announce = None  # async (chat_id, track) -> None, set by the bot
+        self.locks = {}
+        self.lock_users = {}  # chat -> tasks holding or waiting for its lock
+        self.changed_at = {}
+        self.offsets = {}  # where the current stream was started with -ss
+        self.prefetch_tasks = {}
+
+    @contextlib.asynccontextmanager
+    async def _lock(self, chat_id):
+        lock = self.locks.get(chat_id)
+        if lock is None:
+            lock = self.locks[chat_id] = asyncio.Lock()
+        self.lock_users[chat_id] = self.lock_users.get(chat_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self.lock_users[chat_id] -= 1
+            if not self.lock_users[chat_id]:
+                del self.lock_users[chat_id]
+
+    async def _prepare(self, chat_id, track):
+        # Resolve a placeholder (writing the result back to the queue) and find
+        # the input to play: a cached file, or the direct stream URL.
+        if track.id == QUERY_PLACEHOLDER:
+            resolved = await self.resolver.resolve_track(track)
+            await self.queues.replace(chat_id, track, resolved)
+            track = resolved
+        source = self.media_cache.path_for(track.id) if track.id != "video" else None
+        if not source:
+            source = await self.resolver.stream_url(track.url, track.id)
+            if track.id != "video":
+                self.media_cache.schedule(track.id, source)
+        if track.id != "video":
+            self.audio.schedule(track.id, source)
+        return track, source
+
+    def _stream(self, chat_id, track, source, position=0):
+        # Seek, then the track's loudness gain and the chat's volume.
+        video_id = track.id if track.id != "video" else None
+        parameters = f"{seek_parameters(position)} {self.audio.filter_parameters(chat_id, video_id)}"
+        return self.make_stream(source, parameters.strip())
+
+    def prefetch(self, chat_id):
+        # Warm the upcoming tracks in the background (one task per chat).
+        task = self.prefetch_tasks.get(chat_id)
+        if task and not task.done():
+            return
+        upcoming = self.queues.upcoming(chat_id, PREPARE_AHEAD)
+        if upcoming:
+            task = self.prefetch_tasks[chat_id] = detached(self._prefetch(chat_id, upcoming))
+            task.add_done_callback(lambda _: self.prefetch_tasks.pop(chat_id, None))
+
+    async def _prefetch(self, chat_id, tracks):
+        results = await asyncio.gather(*(self._prepare(chat_id, track) for track in tracks), return_exceptions=True)
+        for track, result in zip(tracks, results):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ Prefetch failed for {track.title}: {result}")
+
+    async def start(self, chat_id, position=0):
+        # Joins the call with the head of the queue, `position` seconds in, and
+        # returns the track that started. A head that cannot be prepared is
+        # dropped and the next track tried, like advance() does; the error is
+        # raised when nothing could be started. None if the chat is already in
+        # a call (the tracks stay queued) or the queue is empty.
+        if self.voice_sessions.is_active(chat_id) or self.queues.current(chat_id) is None:
+            return None
+        error = None
+        async with self._lock(chat_id):
+            for _ in range(MAX_SKIP_ON_ERROR):
+                track = self.queues.current(chat_id)
+                if track is None:
+                    break
+                try:
+                    track, source = await self._prepare(chat_id, track)
+                except Exception as e:
+                    logger.error(f"❌ Track Start Error ({track.title}): {e}")
+                    error = e
+                    await self.queues.pop(chat_id)
+                    position = 0
+                    continue
+                started = time.monotonic()
+                try:
+                    joined = await self.voice_sessions.join(chat_id, self._stream(chat_id, track, source, position))
+                except Exception:
+                    # Joining fails for the chat (no voice chat, no rights), not for one
+                    # track: drop only this head instead of burning through the queue.
+                    await self.queues.pop(chat_id)
+                    raise
+                if not joined:
+                    return None  # another start joined meanwhile
+                self.stats.observe("join", time.monotonic() - started)
+                self.changed_at[chat_id] = time.monotonic()
+                self.offsets[chat_id] = position
+                break
+            else:
+                track = None
+            if track is None:
+                if error is not None:
+                    raise error
+                return None
+        self.prefetch(chat_id)
+        return track
+
+    async def advance(self, chat_id, count=1):
+        # Drops the current track (plus count - 1 more) and switches the call to
+        # the next playable one. Leaves the call when the queue runs out.
+        started = time.monotonic()
+        async with self._lock(chat_id):
+            await self.queues.pop(chat_id, count)
+            for _ in range(MAX_SKIP_ON_ERROR):
+                track = self.queues.current(chat_id)
+                if track is None:
+                    await self.voice_sessions.leave(chat_id)
+                    self.forget(chat_id)
+                    return None
+                try:
+                    track, source = await self._prepare(chat_id, track)
+                except Exception as e:
+                    logger.error(f"❌ Track Change Error ({track.title}): {e}")
+                    await self.queues.pop(chat_id)
+                    continue
+                try:
+                    changed = await self.voice_sessions.change(chat_id, self._stream(chat_id, track, source))
+                except Exception as e:
+                    # The call itself is gone (closed, kicked, not in it): drop only
+                    # this head and leave; the rest of the queue stays, as in start().
+                    logger.error(f"❌ Track Change Error ({track.title}): {e}")
+                    await self.queues.pop(chat_id)
+                    await self.voice_sessions.leave(chat_id)
+                    self.forget(chat_id)
+                    return None
+                if not changed:
+                    return None  # stopped meanwhile
+                break
+            else:
+                await self.voice_sessions.leave(chat_id)
+                self.forget(chat_id)
+                return None
+            self.changed_at[chat_id] = time.monotonic()
+            self.offsets.pop(chat_id, None)
+            self.stats.observe("change", time.monotonic() - started)
+        self.prefetch(chat_id)
+        if self.announce:
+            try:
+                await self.announce(chat_id, track)
+            except Exception as e:
+                logger.warning(f"⚠️ Now Playing Announce Error: {e}")
+        return track
+
+    async def stream_ended(self, chat_id):
+        if time.monotonic() - self.changed_at.get(chat_id, 0) < STREAM_END_GRACE:
+            return
+        if not self.voice_sessions.is_active(chat_id):
+            return
+        await self.advance(chat_id)
+
+    async def skip(self, chat_id, count=1):
+        if not self.voice_sessions.is_active(chat_id):
+            return None
+        return await self.advance(chat_id, count)
+
+    async def pause(self, chat_id):
+        return await self.voice_sessions.pause(chat_id)
+
+    async def resume(self, chat_id):
+        return await self.voice_sessions.resume(chat_id)
+
+    async def reapply(self, chat_id):
+        # Restarts the current track where it is, e.g. after a volume change:
+        # the gain and volume are ffmpeg options fixed when a stream starts.
+        if self.voice_sessions.state(chat_id) != PLAYING:
+            return False
+        async with self._lock(chat_id):
+            track = self.queues.current(chat_id)
+            if track is None:
+                return False
+            position = await self.position(chat_id)
+            track, source = await self._prepare(chat_id, track)
+            if not await self.voice_sessions.change(chat_id, self._stream(chat_id, track, source, position)):
+                return False
+            self.changed_at[chat_id] = time.monotonic()
+            self.offsets[chat_id] = position
+        return True
+
+    async def stop(self, chat_id):
+        async with self._lock(chat_id):
+            await self.queues.clear(chat_id)
+            left = await self.voice_sessions.leave(chat_id)
+        self.forget(chat_id)
+        return left
+
+    # ✅ Warm restart
+    async def position(self, chat_id):
+        # Seconds into the current track: pytgcalls' played time plus the seek
+        # the stream was started with. Wall clock since the last change if the
+        # call cannot be asked.
+        try:
+            played = await self.voice_sessions.played_time(chat_id)
+        except Exception:
+            played = None
+        if played is None:
+            played = time.monotonic() - self.changed_at.get(chat_id, time.monotonic())
+        return self.offsets.get(chat_id, 0) + played
+
+    async def snapshot(self, skip=None):
+        # A SessionSnapshot for every chat playing (or paused on) a queued track.
+        playing = [
+            (chat_id, self.queues.current(chat_id)) for chat_id in self.voice_sessions.active_chats()
+            if not (skip and skip(chat_id))
+        ]
+        playing = [(chat_id, track) for chat_id, track in playing
+                   if track is not None and track.id != QUERY_PLACEHOLDER]
+        positions = await asyncio.gather(*(self.position(chat_id) for chat_id, _ in playing))
+        return [
+            SessionSnapshot(chat_id, track.id, track.url, position, self.voice_sessions.state(chat_id) == PAUSED)
+            for (chat_id, track), position in zip(playing, positions)
+        ]
+
+    async def restore(self, snapshots, concurrency=RESTORE_CONCURRENCY):
+        # Rejoins the calls of a previous run, each at its saved position. At
+        # most `concurrency` joins run at once so a restart with many active
+        # groups does not flood Telegram. Returns how many calls were resumed.
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def resume(snapshot):
+            chat_id = snapshot.chat_id
+            async with semaphore:
+                if not snapshot.matches(self.queues.current(chat_id)):
+                    return False  # queue changed (or was cleared) since the snapshot
+                position = snapshot.position
+                track = self.queues.current(chat_id)
+                if track.duration and position >= track.duration - RESTORE_TAIL:
+                    await self.queues.pop(chat_id)
+                    position = 0
+                try:
+                    if not await self.start(chat_id, position):
+                        return False
+                    if snapshot.paused:
+                        await self.pause(chat_id)
+                except Exception as e:
+                    logger.error(f"❌ Session Restore Error ({chat_id}): {e}")
+                    return False
+                return True
+
+        return sum(await asyncio.gather(*(resume(snapshot) for snapshot in snapshots)))
+
+    def forget(self, chat_id):
+        # Call closed, kicked or stopped: drop per-chat playback state.
+        task = self.prefetch_tasks.pop(chat_id, None)
+        if task:
+            task.cancel()
+        self.changed_at.pop(chat_id, None)
+        self.offsets.pop(chat_id, None)
+        # A task woken for the lock may not have taken it yet; keep the lock
+        # while anyone holds or waits for it.
+        if chat_id not in self.lock_users:
+            self.locks.pop(chat_id, None)
@@ -0,0 +1,97 @@
+# queue_store.py
+import json
+import logging
+import os
+import aiofiles
+from chat_queue import Track
+
+logger = logging.getLogger(__name__)
+
+LEGACY_QUEUE_FILE = "queue.json"
+TRACK_COLUMNS = {"duration": "INTEGER NOT NULL DEFAULT 0", "requester": "TEXT NOT NULL DEFAULT ''",
+                 "added_at": "REAL NOT NULL DEFAULT 0"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    duration INTEGER NOT NULL DEFAULT 0,
+    requester TEXT NOT NULL DEFAULT '',
+    added_at REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS queue_chat ON queue (chat_id, id);
+"""
+
+
+class QueueStore:
+    # One row per queued track: enqueue is a single INSERT and stop a single
+    # DELETE, no matter how many tracks are queued across all chats.
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    async def setup(self):
+        await self.storage.executescript(SCHEMA)
+        # Databases created before tracks carried metadata only have url/title/video_id
+        columns = {row[1] for row in await self.storage.fetchall("PRAGMA table_info(queue)")}
+        for name, definition in TRACK_COLUMNS.items():
+            if name not in columns:
+                await self.storage.execute(f"ALTER TABLE queue ADD COLUMN {name} {definition}")
+        await self._import_legacy()
+
+    async def _import_legacy(self):
+        # One-time migration of the old queue.json snapshot.
+        if not os.path.exists(LEGACY_QUEUE_FILE):
+            return
+        try:
+            async with aiofiles.open(LEGACY_QUEUE_FILE, "r") as f:
+                data = await f.read()
+                legacy = json.loads(data) if data else {}
+            rows = [
+                (int(chat_id), *track)
+                for chat_id, tracks in legacy.items()
+                for track in tracks
+            ]
+            if rows and not await self.storage.fetchone("SELECT 1 FROM queue LIMIT 1"):
+                await self.storage.executemany(
+                    "INSERT INTO queue (chat_id, url, title, video_id) VALUES (?, ?, ?, ?)", rows
+                )
+            os.replace(LEGACY_QUEUE_FILE, LEGACY_QUEUE_FILE + ".migrated")
+            logger.info(f"✅ Migrated {len(rows)} queued tracks from {LEGACY_QUEUE_FILE}")
+        except Exception as e:
+            logger.error(f"❌ Legacy Queue Import Error: {e}")
+
+    async def load(self):
+        queue = {}
+        rows = await self.storage.fetchall(
+            "SELECT chat_id, url, title, video_id, duration, requester, added_at FROM queue ORDER BY id"
+        )
+        for chat_id, url, title, video_id, duration, requester, added_at in rows:
+            queue.setdefault(chat_id, []).append(Track(video_id, url, title, duration, requester, added_at))
+        return queue
+
+    async def extend(self, chat_id, tracks):
+        await self.storage.executemany(
+            "INSERT INTO queue (chat_id, url, title, video_id, duration, requester, added_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(chat_id, *track.row()) for track in tracks]
+        )
+
+    async def replace(self, chat_id, old, new):
+        await self.storage.execute(
+            "UPDATE queue SET url = ?, title = ?, video_id = ?, duration = ?, requester = ?, added_at = ? "
+            "WHERE id = (SELECT MIN(id) FROM queue WHERE chat_id = ? AND url = ? AND video_id = ?)",
+            (*new.row(), chat_id, old.url, old.id)
+        )
+
+    async def pop(self, chat_id, count=1):
+        await self.storage.execute(
+            "DELETE FROM queue WHERE id IN (SELECT id FROM queue WHERE chat_id = ? ORDER BY id LIMIT ?)",
+            (chat_id, count)
+        )
+
+    async def clear(self, chat_id):
+        await self.storage.execute("DELETE FROM queue WHERE chat_id = ?", (chat_id,))
@@ -0,0 +1,235 @@
+# radio_relay.py
+import asyncio
+import errno
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+RADIO_FIFO_DIR = os.getenv("RADIO_FIFO_DIR", "radio_fifos")
+SAMPLE_RATE = 48000
+CHANNELS = 2
+BYTES_PER_SECOND = SAMPLE_RATE * CHANNELS * 2
+RING_SECONDS = 4
+CHUNK_SIZE = BYTES_PER_SECOND // 50  # 20 ms of audio
+MAX_PIPE_BACKLOG = BYTES_PER_SECOND
+IDLE_SHUTDOWN = 15
+RECONNECT_DELAY_MAX = 30
+FIFO_OPEN_TIMEOUT = 30
+
+# Tells the ffmpeg inside AudioPiped what it is reading from a subscriber FIFO.
+PCM_INPUT_PARAMETERS = f"-f s16le -ar {SAMPLE_RATE} -ac {CHANNELS}"
+
+
+class RingBuffer:
+    # Fixed-size PCM ring shared by every listener of a station. Writers advance
+    # an absolute `head`; each listener keeps its own read cursor, and a listener
+    # that falls more than `capacity` behind simply skips ahead to live audio.
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buf = bytearray(capacity)
+        self.head = 0
+        self.waiter = None
+
+    def write(self, data):
+        data = data[-self.capacity:]
+        start = self.head % self.capacity
+        first = min(len(data), self.capacity - start)
+        self.buf[start:start + first] = data[:first]
+        self.buf[:len(data) - first] = data[first:]
+        self.head += len(data)
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+        self.waiter = None
+
+    def read(self, cursor):
+        cursor = max(cursor, self.head - self.capacity)
+        if cursor >= self.head:
+            return b"", cursor
+        start = cursor % self.capacity
+        end = self.head % self.capacity
+        if start < end:
+            data = bytes(self.buf[start:end])
+        else:
+            data = bytes(self.buf[start:]) + bytes(self.buf[:end])
+        return data, self.head
+
+    async def wait(self, cursor):
+        while cursor >= self.head:
+            if self.waiter is None:
+                self.waiter = asyncio.get_running_loop().create_future()
+            await self.waiter
+
+
+class Listener:
+    __slots__ = ("chat_id", "path", "task")
+
+    def __init__(self, chat_id, path):
+        self.chat_id = chat_id
+        self.path = path
+        self.task = None
+
+
+class Station:
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+        self.ring = RingBuffer(BYTES_PER_SECOND * RING_SECONDS)
+        self.listeners = {}
+        self.process = None
+        self.task = None
+        self.idle_handle = None
+        self.reconnects = 0
+
+    async def _spawn(self):
+        return await asyncio.create_subprocess_exec(
+            "ffmpeg", "-nostdin", "-loglevel", "error",
+            "-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "5",
+            "-i", self.url, "-vn",
+            "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS), "pipe:1",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+
+    async def run(self):
+        # One upstream connection and one decoder, however many chats listen.
+        delay = 1
+        while self.listeners:
+            try:
+                self.process = await self._spawn()
+                while True:
+                    chunk = await self.process.stdout.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    self.ring.write(chunk)
+                    delay = 1
+                await self.process.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Radio Upstream Error ({self.name}): {e}")
+            finally:
+                self._kill()
+            if not self.listeners:
+                break
+            self.reconnects += 1
+            logger.warning(f"⚠️ Radio upstream {self.name} dropped, reconnecting in {delay}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_DELAY_MAX)
+
+    def _kill(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.kill()
+        self.process = None
+
+    def start(self):
+        if self.idle_handle is not None:
+            self.idle_handle.cancel()
+            self.idle_handle = None
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        self.idle_handle = None
+        if self.listeners:
+            return
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        self._kill()
+        logger.info(f"📻 Radio station {self.name} shut down (no listeners)")
+
+
+class RadioRelay:
+    def __init__(self, fifo_dir=RADIO_FIFO_DIR):
+        self.fifo_dir = fifo_dir
+        self.stations = {}
+        self.listening = {}
+
+    def station_of(self, chat_id):
+        return self.listening.get(chat_id)
+
+    async def subscribe(self, name, url, chat_id):
+        # Returns the FIFO path that the chat's AudioPiped should read from.
+        self.unsubscribe(chat_id)
+        station = self.stations.get(name)
+        if station is None:
+            station = self.stations[name] = Station(name, url)
+        os.makedirs(self.fifo_dir, exist_ok=True)
+        path = os.path.join(self.fifo_dir, f"{chat_id}.pcm")
+        if os.path.exists(path):
+            os.remove(path)
+        os.mkfifo(path)
+        listener = Listener(chat_id, path)
+        station.listeners[chat_id] = listener
+        self.listening[chat_id] = name
+        listener.task = asyncio.create_task(self._pump(station, listener))
+        station.start()
+        return path
+
+    def unsubscribe(self, chat_id):
+        name = self.listening.pop(chat_id, None)
+        station = self.stations.get(name)
+        if station is None:
+            return False
+        listener = station.listeners.pop(chat_id, None)
+        if listener is not None:
+            if listener.task is not None:
+                listener.task.cancel()
+            if os.path.exists(listener.path):
+                os.remove(listener.path)
+        if not station.listeners and station.idle_handle is None:
+            loop = asyncio.get_running_loop()
+            station.idle_handle = loop.call_later(IDLE_SHUTDOWN, station.stop)
+        return True
+
+    async def _open_fifo(self, path):
+        # A FIFO can only be opened for non-blocking writes once a reader exists.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + FIFO_OPEN_TIMEOUT
+        while True:
+            try:
+                return os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as e:
+                if e.errno != errno.ENXIO or loop.time() > deadline:
+                    raise
+            await asyncio.sleep(0.2)
+
+    async def _pump(self, station, listener):
+        # Feeds the listener's FIFO until it is unsubscribed. When the reader
+        # goes away (ffmpeg restarting its input, a probe opening and closing
+        # the pipe) the FIFO is opened again for the next one; a listener whose
+        # reader never comes back is dropped instead of going silent.
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                fd = await self._open_fifo(listener.path)
+                transport, _ = await loop.connect_write_pipe(asyncio.Protocol, os.fdopen(fd, "wb", 0))
+                try:
+                    cursor = station.ring.head
+                    while not transport.is_closing():
+                        await station.ring.wait(cursor)
+                        data, cursor = station.ring.read(cursor)
+                        # A listener that can't keep up drops audio rather than memory.
+                        if transport.get_write_buffer_size() < MAX_PIPE_BACKLOG:
+                            transport.write(data)
+                finally:
+                    transport.close()
+                logger.info(f"📻 Radio listener {listener.chat_id} reader closed, reopening")
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"❌ Radio Listener Error ({listener.chat_id}): {e}")
+            if station.listeners.get(listener.chat_id) is listener:
+                listener.task = None  # don't let unsubscribe cancel this task
+                self.unsubscribe(listener.chat_id)
+
+    def stats(self):
+        return {
+            name: {"listeners": len(station.listeners), "reconnects": station.reconnects}
+            for name, station in self.stations.items() if station.task is not None
+        }
+
+
+radio_relay = RadioRelay()
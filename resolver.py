@@ -0,0 +1,203 @@
+# resolver.py
+import asyncio
+import logging
+import time
+from collections import Counter
+from urllib.parse import urlparse, parse_qs
+from cache import TTLCache
+from extractor import ExtractorBusy, ExtractionError
+from tracing import detached, span
+from spotify_resolver import normalize_query
+
+logger = logging.getLogger(__name__)
+
+METADATA_CACHE_SIZE = 20000
+METADATA_CACHE_TTL = 7 * 24 * 60 * 60
+STREAM_CACHE_SIZE = 5000
+STREAM_DEFAULT_TTL = 30 * 60
+STREAM_EXPIRY_MARGIN = 10 * 60
+MAX_DURATION = 10 * 60
+SEARCH_CANDIDATES = 5
+# Queue entries with this video_id carry a search query instead of a page URL
+# (e.g. imported playlist tracks) and are resolved shortly before they play.
+QUERY_PLACEHOLDER = "query"
+# Give up on a query when no search path has produced a result by then.
+RESOLVE_BUDGET = 20
+
+
+class SongNotFound(Exception):
+    def __init__(self, source):
+        super().__init__(f"No results found on {source}")
+        self.source = source
+
+
+def youtube_url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def stream_ttl(url):
+    # googlevideo URLs carry their own expiry as a unix timestamp in `expire`.
+    try:
+        expire = int(parse_qs(urlparse(url).query)["expire"][0])
+    except (KeyError, ValueError, IndexError):
+        return STREAM_DEFAULT_TTL
+    return expire - time.time() - STREAM_EXPIRY_MARGIN
+
+
+class SongResolver:
+    # Sits in front of Spotify -> YouTube search -> extraction. Searches are flat
+    # (no formats), so only the video that actually plays is fully extracted.
+    # Identical queries in flight at the same time share one task, resolved
+    # metadata is kept for a week, and direct stream URLs are kept until just
+    # before they expire.
+
+    def __init__(self, spotify, extractor):
+        self.spotify = spotify
+        self.extractor = extractor
+        self.metadata = TTLCache(maxsize=METADATA_CACHE_SIZE, ttl=METADATA_CACHE_TTL)
+        self.streams = TTLCache(maxsize=STREAM_CACHE_SIZE, ttl=STREAM_DEFAULT_TTL)
+        self.candidates = TTLCache(maxsize=METADATA_CACHE_SIZE, ttl=STREAM_DEFAULT_TTL)
+        self.inflight = {}
+        self.coalesced = 0
+        self.race_wins = Counter()
+
+    async def _singleflight(self, key, factory):
+        # The shared task belongs to no single request, so it runs detached from
+        # the caller's trace; each caller records only its own wait.
+        task = self.inflight.get(key)
+        if task is None:
+            task = self.inflight[key] = detached(factory())
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: one impatient caller must not cancel the lookup for everyone else
+        with span(f"{key[0]} lookup"):
+            return await asyncio.shield(task)
+
+    def _remember(self, key, meta):
+        self.metadata.set(key, meta)
+        return meta
+
+    def remember_stream(self, key, url):
+        self.streams.set(key, url, stream_ttl(url))
+
+    async def search(self, query, limit=SEARCH_CANDIDATES):
+        # Flat search: returns [{video_id, title, duration}] without touching formats.
+        info = await self.extractor.extract(f"ytsearch{limit}:{query}", profile="flat")
+        results = []
+        for entry in (info or {}).get("entries") or []:
+            if not entry or not entry.get("id"):
+                continue
+            meta = {
+                "video_id": entry["id"],
+                "title": entry.get("title") or "Unknown Title",
+                "duration": int(entry.get("duration") or 0)
+            }
+            self.candidates.set(meta["video_id"], meta)
+            results.append(meta)
+        return results
+
+    def candidate(self, video_id):
+        # Metadata of a recent search result (used by the .search buttons).
+        return self.candidates.get(video_id)
+
+    async def _search_youtube(self, query):
+        results = await self.search(query)
+        if not results:
+            return None
+        # Skip over-long uploads (mixes, full albums) before any full extraction;
+        # if every candidate is too long, return the first so the caller can say so
+        # (_resolve_query only settles for it once no other path is left).
+        return next((meta for meta in results if meta["duration"] <= MAX_DURATION), results[0])
+
+    async def _resolve_query(self, query, key):
+        # Two paths race: Spotify (canonical title/artist, then a YouTube search
+        # on that) and a direct YouTube search on the raw query. The first
+        # usable result wins and the other path is cancelled, so a Spotify miss
+        # or a slow Spotify API no longer blocks (or fails) the play. An
+        # over-long result only wins when no other path can still do better.
+        loop = asyncio.get_running_loop()
+        pending = {asyncio.ensure_future(self._search_youtube(query)): "youtube"}
+        if self.spotify.enabled:
+            pending[asyncio.ensure_future(self.spotify.search_track(query))] = "spotify"
+        deadline = loop.time() + RESOLVE_BUDGET
+        errors = []
+        too_long = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, timeout=deadline - loop.time(), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if too_long:
+                        break
+                    raise asyncio.TimeoutError(f"No result within {RESOLVE_BUDGET}s")
+                for task in done:
+                    path = pending.pop(task)
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                    elif path == "spotify":
+                        song = task.result()
+                        if song:
+                            search = asyncio.ensure_future(self._search_youtube(f"{song['title']} {song['artist']}"))
+                            pending[search] = "spotify+youtube"
+                    elif task.result():
+                        meta = task.result()
+                        if meta["duration"] > MAX_DURATION:
+                            too_long = too_long or meta
+                            continue
+                        self.race_wins[path] += 1
+                        return self._remember(key, meta)
+        finally:
+            for task in pending:
+                task.cancel()
+        if too_long:
+            return self._remember(key, too_long)
+        if errors:
+            busy = [e for e in errors if isinstance(e, ExtractorBusy)]
+            raise (busy or errors)[0]
+        raise SongNotFound("YouTube")
+
+    async def _extract_stream(self, page_url, key):
+        info = await self.extractor.extract(page_url)
+        if not info or not info.get("url"):
+            raise ExtractionError("No stream found.")
+        self.remember_stream(key, info["url"])
+        return info["url"]
+
+    async def resolve(self, query):
+        # Metadata only; the stream URL is extracted by stream_url() when the track plays.
+        key = normalize_query(query)
+        meta = self.metadata.get(key)
+        if meta is None:
+            return await self._singleflight(("query", key), lambda: self._resolve_query(query, key))
+        return meta
+
+    async def resolve_track(self, track):
+        # The track itself, or a resolved copy when it is a search-query placeholder.
+        if track.id != QUERY_PLACEHOLDER:
+            return track
+        meta = await self.resolve(track.url)
+        return track.resolved(meta["video_id"], youtube_url(meta["video_id"]), meta["title"], meta["duration"])
+
+    async def stream_url(self, page_url, video_id=None):
+        # Queued tracks only keep their page URL / video_id; the signed stream
+        # URL is looked up here, right before it is needed.
+        key = page_url if video_id in (None, "video") else video_id
+        if key != page_url:
+            page_url = youtube_url(video_id)
+        url = self.streams.get(key)
+        if url:
+            return url
+        return await self._singleflight(("stream", key), lambda: self._extract_stream(page_url, key))
+
+    def stats(self):
+        return {
+            "metadata_hits": self.metadata.hits,
+            "metadata_misses": self.metadata.misses,
+            "stream_hits": self.streams.hits,
+            "stream_misses": self.streams.misses,
+            "coalesced": self.coalesced,
+            "race_wins": dict(self.race_wins),
+            "inflight": len(self.inflight),
+        }
@@ -0,0 +1,90 @@
+# session_store.py
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_INTERVAL = int(os.getenv("SNAPSHOT_INTERVAL", 15))
+# Calls are only resumed from a snapshot younger than this; after a longer
+# outage the groups have moved on.
+SNAPSHOT_MAX_AGE = int(os.getenv("SNAPSHOT_MAX_AGE", 60 * 60))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    chat_id INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    position REAL NOT NULL,
+    paused INTEGER NOT NULL DEFAULT 0,
+    saved_at REAL NOT NULL
+);
+"""
+
+
+class SessionSnapshot:
+    # One chat in a call: which track is playing (the head of its queue) and
+    # how many seconds into it.
+    __slots__ = ("chat_id", "video_id", "url", "position", "paused", "saved_at")
+
+    def __init__(self, chat_id, video_id, url, position, paused=False, saved_at=None):
+        self.chat_id = chat_id
+        self.video_id = video_id
+        self.url = url
+        self.position = position
+        self.paused = paused
+        self.saved_at = saved_at or time.time()
+
+    def matches(self, track):
+        return track is not None and track.id == self.video_id and track.url == self.url
+
+    def row(self):
+        return (self.chat_id, self.video_id, self.url, self.position, int(self.paused), self.saved_at)
+
+
+class SessionStore:
+    # The calls in progress, rewritten as a whole every SNAPSHOT_INTERVAL and
+    # once more on shutdown, so a restart (deploy, crash, SIGTERM) can rejoin
+    # them. Queues are persisted separately; a snapshot only points at the
+    # head of its chat's queue.
+
+    def __init__(self, storage, max_age=SNAPSHOT_MAX_AGE):
+        self.storage = storage
+        self.max_age = max_age
+        self.snapshot_task = None
+
+    async def setup(self):
+        await self.storage.executescript(SCHEMA)
+
+    async def load(self):
+        rows = await self.storage.fetchall(
+            "SELECT chat_id, video_id, url, position, paused, saved_at FROM sessions WHERE saved_at >= ?",
+            (time.time() - self.max_age,)
+        )
+        return [SessionSnapshot(chat_id, video_id, url, position, bool(paused), saved_at)
+                for chat_id, video_id, url, position, paused, saved_at in rows]
+
+    async def save(self, snapshots):
+        await self.storage.executebatch([
+            ("DELETE FROM sessions", [()]),
+            ("INSERT INTO sessions (chat_id, video_id, url, position, paused, saved_at) VALUES (?, ?, ?, ?, ?, ?)",
+             (snapshot.row() for snapshot in snapshots)),
+        ])
+
+    def start(self, collect):
+        # `collect` is an async callable returning the current SessionSnapshots.
+        async def loop():
+            while True:
+                await asyncio.sleep(SNAPSHOT_INTERVAL)
+                try:
+                    await self.save(await collect())
+                except Exception as e:
+                    logger.error(f"❌ Session Snapshot Error: {e}")
+        self.snapshot_task = asyncio.create_task(loop())
+
+    async def stop(self, collect):
+        # Final snapshot on shutdown, taken before the calls are torn down.
+        if self.snapshot_task:
+            self.snapshot_task.cancel()
+        await self.save(await collect())
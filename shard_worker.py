@@ -0,0 +1,118 @@
+# shard_worker.py
+# One voice-call worker: its own assistant client and PyTgCalls instance,
+# driven by the coordinator over stdin/stdout (one JSON object per line).
+import asyncio
+import json
+import logging
+import sys
+from pyrogram import Client
+from pytgcalls import PyTgCalls
+from pytgcalls.types import StreamType
+from pytgcalls.types.input_stream import AudioPiped
+from pytgcalls.exceptions import AlreadyJoinedError, NotInGroupCallError
+from config import API_ID, API_HASH
+from sharding import ASSISTANT_SESSIONS
+
+# stdout carries the protocol, so logs go to stderr only.
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - shard %(process)d - %(levelname)s - %(message)s",
+    stream=sys.stderr
+)
+logger = logging.getLogger(__name__)
+
+
+def emit(message):
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def build_stream(params):
+    return AudioPiped(params["source"], additional_ffmpeg_parameters=params.get("ffmpeg_parameters", ""))
+
+
+async def handle(calls, request):
+    op = request["op"]
+    chat_id = request.get("chat_id")
+    if op == "join":
+        try:
+            await calls.join_group_call(chat_id, build_stream(request), stream_type=StreamType().pulse_stream)
+        except AlreadyJoinedError:
+            await calls.change_stream(chat_id, build_stream(request))
+    elif op == "change":
+        await calls.change_stream(chat_id, build_stream(request))
+    elif op == "pause":
+        await calls.pause_stream(chat_id)
+    elif op == "resume":
+        await calls.resume_stream(chat_id)
+    elif op == "leave":
+        try:
+            await calls.leave_group_call(chat_id)
+        except NotInGroupCallError:
+            pass
+    elif op == "played_time":
+        return await calls.played_time(chat_id)
+    elif op == "status":
+        return {"calls": [call.chat_id for call in calls.active_calls]}
+    else:
+        raise ValueError(f"Unknown op {op}")
+
+
+async def respond(calls, request):
+    try:
+        result = await handle(calls, request)
+        emit({"id": request.get("id"), "ok": True, "result": result})
+    except Exception as e:
+        logger.error(f"❌ Shard Op Error ({request.get('op')}): {e}")
+        emit({"id": request.get("id"), "ok": False, "error": f"{type(e).__name__}: {e}"})
+
+
+async def main(index):
+    client = Client(
+        f"RolaVibeShard{index}",
+        api_id=API_ID,
+        api_hash=API_HASH,
+        session_string=ASSISTANT_SESSIONS[index],
+        in_memory=True
+    )
+    calls = PyTgCalls(client)
+
+    @calls.on_stream_end()
+    async def stream_ended(_, update):
+        emit({"event": "stream_end", "chat_id": update.chat_id})
+
+    @calls.on_closed_voice_chat()
+    async def closed(_, chat_id):
+        emit({"event": "closed", "chat_id": chat_id})
+
+    @calls.on_kicked()
+    async def kicked(_, chat_id):
+        emit({"event": "closed", "chat_id": chat_id})
+
+    await client.start()
+    await calls.start()
+    emit({"event": "ready", "index": index})
+
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    while True:
+        line = await reader.readline()
+        if not line:
+            break  # coordinator closed the pipe: shut down
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        asyncio.create_task(respond(calls, request))
+
+    for chat_id in [call.chat_id for call in calls.active_calls]:
+        try:
+            await calls.leave_group_call(chat_id)
+        except Exception:
+            pass
+    await client.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1])))
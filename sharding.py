@@ -0,0 +1,266 @@
+# sharding.py
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import math
+import os
+import sys
+from types import SimpleNamespace
+
+logger = logging.getLogger(__name__)
+
+# SHARD_COUNT=0 keeps every call inside the bot process (the default).
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", 0))
+# One assistant session string per shard, comma separated.
+ASSISTANT_SESSIONS = [s for s in os.getenv("ASSISTANT_SESSIONS", "").split(",") if s.strip()]
+SHARD_WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shard_worker.py")
+VIRTUAL_NODES = 64
+LOAD_FACTOR = 1.25
+REQUEST_TIMEOUT = 30
+RESPAWN_DELAY = 5
+
+
+class ShardError(Exception):
+    pass
+
+
+class StreamSpec:
+    # Serializable stand-in for AudioPiped; the worker builds the real stream.
+    __slots__ = ("source", "ffmpeg_parameters")
+
+    def __init__(self, source, ffmpeg_parameters=""):
+        self.source = source
+        self.ffmpeg_parameters = ffmpeg_parameters
+
+    def to_dict(self):
+        return {"source": self.source, "ffmpeg_parameters": self.ffmpeg_parameters}
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(str(key).encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    # Consistent hashing with bounded loads: a chat goes to the first shard
+    # clockwise from its hash whose load is under LOAD_FACTOR x the average.
+
+    def __init__(self, nodes, replicas=VIRTUAL_NODES):
+        self.ring = sorted((_hash(f"{node}:{i}"), node) for node in nodes for i in range(replicas))
+        self.keys = [point for point, _ in self.ring]
+        self.nodes = list(nodes)
+
+    def pick(self, key, loads):
+        limit = max(1, math.ceil((sum(loads.values()) + 1) / len(self.nodes) * LOAD_FACTOR))
+        start = bisect.bisect(self.keys, _hash(key))
+        fallback = None
+        for offset in range(len(self.ring)):
+            node = self.ring[(start + offset) % len(self.ring)][1]
+            if fallback is None:
+                fallback = node
+            if loads.get(node, 0) < limit:
+                return node
+        return fallback
+
+
+class Shard:
+    def __init__(self, index, coordinator):
+        self.index = index
+        self.coordinator = coordinator
+        self.process = None
+        self.reader_task = None
+        self.ready = None
+        self.pending = {}
+        self.next_id = 0
+        self.chats = set()
+        self.stopping = False
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def spawn(self):
+        self.ready = asyncio.get_running_loop().create_future()
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, SHARD_WORKER, str(self.index),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE
+        )
+        self.reader_task = asyncio.create_task(self._read())
+        await asyncio.wait_for(asyncio.shield(self.ready), REQUEST_TIMEOUT * 2)
+        logger.info(f"✅ Shard {self.index} ready (pid {self.process.pid})")
+
+    async def _read(self):
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                break
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "event" in message:
+                if message["event"] == "ready" and not self.ready.done():
+                    self.ready.set_result(True)
+                else:
+                    self.coordinator.dispatch(self, message)
+                continue
+            future = self.pending.pop(message.get("id"), None)
+            if future is not None and not future.done():
+                if message.get("ok"):
+                    future.set_result(message.get("result"))
+                else:
+                    future.set_exception(ShardError(message.get("error", "unknown error")))
+        await self.process.wait()
+        self._fail_pending()
+        self.coordinator.shard_exited(self)
+
+    def _fail_pending(self):
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(ShardError(f"Shard {self.index} exited"))
+        self.pending.clear()
+        if self.ready is not None and not self.ready.done():
+            self.ready.set_exception(ShardError(f"Shard {self.index} failed to start"))
+
+    async def request(self, op, **params):
+        if not self.alive:
+            raise ShardError(f"Shard {self.index} is not running")
+        self.next_id += 1
+        request_id = self.next_id
+        future = self.pending[request_id] = asyncio.get_running_loop().create_future()
+        try:
+            self.process.stdin.write(json.dumps({"id": request_id, "op": op, **params}).encode() + b"\n")
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # The worker died between the alive check and the write.
+            self.pending.pop(request_id, None)
+            raise ShardError(f"Shard {self.index} exited") from None
+        try:
+            return await asyncio.wait_for(future, REQUEST_TIMEOUT)
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def stop(self):
+        self.stopping = True
+        if self.alive:
+            self.process.stdin.close()
+            try:
+                await asyncio.wait_for(self.process.wait(), 10)
+            except asyncio.TimeoutError:
+                self.process.kill()
+
+
+class ShardCoordinator:
+    # Drop-in replacement for the PyTgCalls methods VoiceSessionManager uses.
+    # Each chat is pinned to one worker process (own assistant client and
+    # PyTgCalls) and every call operation is forwarded over a JSON-lines pipe.
+
+    def __init__(self, count=SHARD_COUNT, sessions=ASSISTANT_SESSIONS):
+        # Checked here, once: a worker without a session would die on startup
+        # and be respawned forever.
+        if len(sessions) < count:
+            raise ShardError(
+                f"SHARD_COUNT is {count} but ASSISTANT_SESSIONS has {len(sessions)} session(s); "
+                "set one assistant session string per shard"
+            )
+        self.shards = [Shard(index, self) for index in range(count)]
+        self.ring = HashRing(range(count))
+        self.assignments = {}
+        self.handlers = {"stream_end": [], "closed": []}
+
+    async def start(self):
+        await asyncio.gather(*(shard.spawn() for shard in self.shards))
+
+    async def stop(self):
+        await asyncio.gather(*(shard.stop() for shard in self.shards))
+
+    def loads(self):
+        return {shard.index: len(shard.chats) for shard in self.shards if shard.alive}
+
+    def shard_for(self, chat_id):
+        index = self.assignments.get(chat_id)
+        if index is None:
+            loads = self.loads()
+            if not loads:
+                raise ShardError("No shard is running")
+            index = self.ring.pick(chat_id, loads)
+            self.assignments[chat_id] = index
+            self.shards[index].chats.add(chat_id)
+        return self.shards[index]
+
+    def release(self, chat_id):
+        index = self.assignments.pop(chat_id, None)
+        if index is not None:
+            self.shards[index].chats.discard(chat_id)
+
+    # ✅ PyTgCalls-compatible surface
+    async def join_group_call(self, chat_id, stream, stream_type=None):
+        shard = self.shard_for(chat_id)
+        try:
+            await shard.request("join", chat_id=chat_id, **stream.to_dict())
+        except Exception:
+            self.release(chat_id)
+            raise
+
+    async def change_stream(self, chat_id, stream):
+        await self.shard_for(chat_id).request("change", chat_id=chat_id, **stream.to_dict())
+
+    async def pause_stream(self, chat_id):
+        await self.shard_for(chat_id).request("pause", chat_id=chat_id)
+
+    async def resume_stream(self, chat_id):
+        await self.shard_for(chat_id).request("resume", chat_id=chat_id)
+
+    async def leave_group_call(self, chat_id):
+        if chat_id not in self.assignments:
+            return
+        try:
+            await self.shard_for(chat_id).request("leave", chat_id=chat_id)
+        finally:
+            self.release(chat_id)
+
+    async def played_time(self, chat_id):
+        return await self.shard_for(chat_id).request("played_time", chat_id=chat_id)
+
+    async def status(self):
+        results = await asyncio.gather(
+            *(shard.request("status") for shard in self.shards if shard.alive), return_exceptions=True
+        )
+        return [result for result in results if not isinstance(result, Exception)]
+
+    def on_stream_end(self):
+        return self._register("stream_end")
+
+    def on_closed_voice_chat(self):
+        return self._register("closed")
+
+    def _register(self, event):
+        def decorator(func):
+            self.handlers[event].append(func)
+            return func
+        return decorator
+
+    def dispatch(self, shard, message):
+        event = message["event"]
+        if event == "closed":
+            self.release(message["chat_id"])
+        update = SimpleNamespace(chat_id=message.get("chat_id"))
+        for handler in self.handlers.get(event, []):
+            asyncio.create_task(handler(self, update))
+
+    def shard_exited(self, shard):
+        # Every call on a dead worker is gone: report them closed and respawn.
+        for chat_id in list(shard.chats):
+            self.dispatch(shard, {"event": "closed", "chat_id": chat_id})
+        if not shard.stopping:
+            logger.error(f"❌ Shard {shard.index} exited, respawning in {RESPAWN_DELAY}s")
+            asyncio.create_task(self._respawn(shard))
+
+    async def _respawn(self, shard):
+        await asyncio.sleep(RESPAWN_DELAY)
+        try:
+            await shard.spawn()
+        except Exception as e:
+            logger.error(f"❌ Shard {shard.index} Respawn Error: {e}")
@@ -0,0 +1,134 @@
+# spotify_resolver.py
+import asyncio
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from cache import TTLCache
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+SPOTIFY_WORKERS = 4
+SPOTIFY_CACHE_SIZE = 5000
+SPOTIFY_CACHE_TTL = 6 * 60 * 60
+SPOTIFY_MISS_TTL = 10 * 60
+PLAYLIST_MAX_TRACKS = 100
+PLAYLIST_PAGE_SIZE = 100  # the most playlist_items returns per request
+
+SPOTIFY_COLLECTION_URL = re.compile(
+    r"(?:open\.spotify\.com/(?:intl-[\w-]+/)?|spotify:)(playlist|album)[/:]([A-Za-z0-9]+)"
+)
+
+
+def normalize_query(query):
+    return re.sub(r"\s+", " ", query).strip().casefold()
+
+
+def parse_collection_url(url):
+    # open.spotify.com/playlist/<id>?si=..., spotify:album:<id> -> ("playlist", "<id>")
+    match = SPOTIFY_COLLECTION_URL.search(url)
+    return (match.group(1), match.group(2)) if match else None
+
+
+class SpotifyResolver:
+    # Runs the blocking spotipy client on a small dedicated thread pool so a
+    # Spotify round-trip never stalls the event loop, and remembers results.
+
+    def __init__(self, sp=None, workers=SPOTIFY_WORKERS):
+        self.sp = sp
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="spotify")
+        self.cache = TTLCache(maxsize=SPOTIFY_CACHE_SIZE, ttl=SPOTIFY_CACHE_TTL)
+
+    @property
+    def enabled(self):
+        return self.sp is not None
+
+    def connect(self, client_id, client_secret):
+        # Blocking; run it on self.executor. spotipy (and requests with it) is
+        # imported here rather than at startup, and the client-credentials
+        # token is only fetched by the first API call.
+        import spotipy
+        from spotipy.oauth2 import SpotifyClientCredentials
+        self.sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
+            client_id=client_id,
+            client_secret=client_secret
+        ))
+
+    def _refresh_token(self):
+        # Client-credentials tokens expire hourly; spotipy refreshes them on
+        # expiry, but a revoked token only shows up as a 401, so drop it here.
+        try:
+            self.sp.auth_manager.cache_handler.save_token_to_cache(None)
+        except Exception as e:
+            logger.error(f"❌ Spotify Token Refresh Error: {e}")
+
+    def _call(self, method, *args, **kwargs):
+        from spotipy.exceptions import SpotifyException
+        for attempt in range(2):
+            try:
+                return method(*args, **kwargs)
+            except SpotifyException as e:
+                if e.http_status != 401 or attempt:
+                    raise
+                self._refresh_token()
+
+    def _search(self, query):
+        results = self._call(self.sp.search, q=query, limit=1)
+        if results["tracks"]["items"]:
+            track = results["tracks"]["items"][0]
+            return {
+                "title": track["name"],
+                "artist": track["artists"][0]["name"],
+                "url": track["external_urls"]["spotify"]
+            }
+        return None
+
+    @traced("spotify")
+    async def search_track(self, query):
+        if not self.enabled:
+            return None
+        key = normalize_query(query)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached or None
+        loop = asyncio.get_running_loop()
+        try:
+            song = await loop.run_in_executor(self.executor, self._search, query)
+        except Exception as e:
+            logger.error(f"❌ Spotify API Error: {e}")
+            return None
+        # Misses are cached briefly as {} so repeated typos don't hit the API.
+        self.cache.set(key, song or {}, None if song else SPOTIFY_MISS_TTL)
+        return song
+
+    def _collection_tracks(self, kind, collection_id, limit):
+        # Whole pages of up to 100 tracks per request, following `next` links.
+        if kind == "playlist":
+            name = self._call(self.sp.playlist, collection_id, fields="name")["name"]
+            page = self._call(
+                self.sp.playlist_items, collection_id, limit=PLAYLIST_PAGE_SIZE, additional_types=("track",),
+                fields="items(track(name,duration_ms,artists(name))),next"
+            )
+        else:
+            album = self._call(self.sp.album, collection_id)
+            name, page = album["name"], album["tracks"]
+        tracks = []
+        while page:
+            for item in page["items"]:
+                track = item.get("track") if kind == "playlist" else item
+                if not track or not track.get("name"):
+                    continue  # removed tracks and podcast episodes
+                tracks.append({
+                    "title": track["name"],
+                    "artist": track["artists"][0]["name"] if track.get("artists") else "",
+                    "duration": (track.get("duration_ms") or 0) // 1000
+                })
+            if len(tracks) >= limit or not page.get("next"):
+                break
+            page = self._call(self.sp.next, page)
+        return name, tracks[:limit]
+
+    async def collection_tracks(self, kind, collection_id, limit=PLAYLIST_MAX_TRACKS):
+        # (name, [{title, artist, duration}]) for a playlist or album.
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._collection_tracks, kind, collection_id, limit)
@@ -0,0 +1,151 @@
+# stats.py
+import asyncio
+import logging
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+STATS_FLUSH_INTERVAL = 60
+HOURS_KEPT = 48
+TOP_TRACKS = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stat_users (user_id INTEGER PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS stat_groups (chat_id INTEGER PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS stat_hourly_plays (hour INTEGER PRIMARY KEY, plays INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS stat_tracks (
+    video_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    plays INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stat_latency (
+    name TEXT PRIMARY KEY,
+    total REAL NOT NULL,
+    count INTEGER NOT NULL
+);
+"""
+
+
+def current_hour():
+    return int(time.time() // 3600)
+
+
+class StatsAggregator:
+    # All counters live in memory and are updated as events happen, so readers
+    # get O(1) answers. New rows and count deltas are buffered and written to
+    # SQLite in one transaction every STATS_FLUSH_INTERVAL seconds.
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.users = set()
+        self.groups = set()
+        self.hourly = {}
+        self.track_plays = Counter()
+        self.titles = {}
+        self.top = []
+        self.latency = {}
+        self.total_plays = 0
+        self._new_users = []
+        self._new_groups = []
+        self._hourly_delta = Counter()
+        self._track_delta = Counter()
+        self._latency_delta = {}
+        self.flush_task = None
+
+    async def load(self):
+        await self.storage.executescript(SCHEMA)
+        self.users = {row[0] for row in await self.storage.fetchall("SELECT user_id FROM stat_users")}
+        self.groups = {row[0] for row in await self.storage.fetchall("SELECT chat_id FROM stat_groups")}
+        self.hourly = dict(await self.storage.fetchall(
+            "SELECT hour, plays FROM stat_hourly_plays WHERE hour >= ?", (current_hour() - HOURS_KEPT,)
+        ))
+        for video_id, title, plays in await self.storage.fetchall("SELECT video_id, title, plays FROM stat_tracks"):
+            self.track_plays[video_id] = plays
+            self.titles[video_id] = title
+        self.total_plays = sum(self.track_plays.values())
+        self.top = [video_id for video_id, _ in self.track_plays.most_common(TOP_TRACKS)]
+        for name, total, count in await self.storage.fetchall("SELECT name, total, count FROM stat_latency"):
+            self.latency[name] = [total, count]
+        self.flush_task = asyncio.create_task(self._flush_loop())
+
+    # ✅ Event Hooks
+    def record_user(self, user_id):
+        if user_id not in self.users:
+            self.users.add(user_id)
+            self._new_users.append((user_id,))
+
+    def record_group(self, chat_id):
+        if chat_id not in self.groups:
+            self.groups.add(chat_id)
+            self._new_groups.append((chat_id,))
+
+    def record_play(self, video_id, title):
+        hour = current_hour()
+        self.hourly[hour] = self.hourly.get(hour, 0) + 1
+        self._hourly_delta[hour] += 1
+        self.track_plays[video_id] += 1
+        self._track_delta[video_id] += 1
+        self.titles[video_id] = title
+        self.total_plays += 1
+        self._update_top(video_id)
+
+    def observe(self, name, seconds):
+        for bucket in (self.latency, self._latency_delta):
+            entry = bucket.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def _update_top(self, video_id):
+        # Only the track that just changed can move, so the top list is kept
+        # sorted incrementally instead of ranking every track on each read.
+        if video_id not in self.top:
+            if len(self.top) >= TOP_TRACKS and self.track_plays[video_id] <= self.track_plays[self.top[-1]]:
+                return
+            self.top.append(video_id)
+        self.top.sort(key=self.track_plays.__getitem__, reverse=True)
+        del self.top[TOP_TRACKS:]
+
+    # ✅ Readers
+    def plays_last_hour(self):
+        return self.hourly.get(current_hour(), 0)
+
+    def average(self, name):
+        total, count = self.latency.get(name, (0.0, 0))
+        return total / count if count else 0.0
+
+    def top_tracks(self, limit=5):
+        return [(self.titles.get(video_id, video_id), self.track_plays[video_id]) for video_id in self.top[:limit]]
+
+    # ✅ Persistence
+    async def flush(self):
+        new_users, self._new_users = self._new_users, []
+        new_groups, self._new_groups = self._new_groups, []
+        hourly, self._hourly_delta = self._hourly_delta, Counter()
+        tracks, self._track_delta = self._track_delta, Counter()
+        latency, self._latency_delta = self._latency_delta, {}
+        if not (new_users or new_groups or hourly or tracks or latency):
+            return
+        await self.storage.executebatch([
+            ("INSERT OR IGNORE INTO stat_users (user_id) VALUES (?)", new_users),
+            ("INSERT OR IGNORE INTO stat_groups (chat_id) VALUES (?)", new_groups),
+            ("INSERT INTO stat_hourly_plays (hour, plays) VALUES (?, ?) "
+             "ON CONFLICT(hour) DO UPDATE SET plays = plays + excluded.plays", hourly.items()),
+            ("INSERT INTO stat_tracks (video_id, title, plays) VALUES (?, ?, ?) "
+             "ON CONFLICT(video_id) DO UPDATE SET plays = plays + excluded.plays, title = excluded.title",
+             ((video_id, self.titles.get(video_id, ""), plays) for video_id, plays in tracks.items())),
+            ("INSERT INTO stat_latency (name, total, count) VALUES (?, ?, ?) "
+             "ON CONFLICT(name) DO UPDATE SET total = total + excluded.total, count = count + excluded.count",
+             ((name, total, count) for name, (total, count) in latency.items())),
+        ])
+        cutoff = current_hour() - HOURS_KEPT
+        for hour in [hour for hour in self.hourly if hour < cutoff]:
+            del self.hourly[hour]
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(STATS_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Stats Flush Error: {e}")
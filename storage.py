@@ -0,0 +1,97 @@
+# storage.py
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = "rolavibe.db"
+
+
+class Storage:
+    # Thin async wrapper around one SQLite connection. Every statement runs on a
+    # single dedicated thread, so writes stay ordered and never block the event loop.
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self.conn = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage")
+        self.background = set()
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    async def open(self):
+        if self.conn is None:
+            self.conn = await self._run(self._connect)
+
+    async def close(self):
+        if self.background:
+            await asyncio.gather(*self.background, return_exceptions=True)
+        if self.conn is not None:
+            await self._run(self.conn.close)
+            self.conn = None
+
+    def _execute(self, sql, params):
+        with self.conn:
+            return self.conn.execute(sql, params).rowcount
+
+    def _executemany(self, sql, rows):
+        with self.conn:
+            return self.conn.executemany(sql, rows).rowcount
+
+    def _executebatch(self, statements):
+        with self.conn:
+            for sql, rows in statements:
+                self.conn.executemany(sql, rows)
+
+    def _executescript(self, script):
+        with self.conn:
+            self.conn.executescript(script)
+
+    def _fetchall(self, sql, params):
+        return self.conn.execute(sql, params).fetchall()
+
+    async def execute(self, sql, params=()):
+        return await self._run(self._execute, sql, params)
+
+    def execute_later(self, sql, params=()):
+        # Fire-and-forget write for hot paths. The task is kept referenced until
+        # it finishes and its error logged, instead of vanishing unretrieved.
+        task = asyncio.ensure_future(self.execute(sql, params))
+        self.background.add(task)
+        task.add_done_callback(self._background_done)
+        return task
+
+    def _background_done(self, task):
+        self.background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"❌ Background Write Error: {task.exception()}")
+
+    async def executemany(self, sql, rows):
+        return await self._run(self._executemany, sql, list(rows))
+
+    async def executebatch(self, statements):
+        # [(sql, rows), ...] committed together in one transaction
+        await self._run(self._executebatch, [(sql, list(rows)) for sql, rows in statements])
+
+    async def executescript(self, script):
+        await self._run(self._executescript, script)
+
+    async def fetchall(self, sql, params=()):
+        return await self._run(self._fetchall, sql, params)
+
+    async def fetchone(self, sql, params=()):
+        rows = await self.fetchall(sql, params)
+        return rows[0] if rows else None
+
+
+storage = Storage()
@@ -0,0 +1,155 @@
+# thumbnails.py
+import asyncio
+import functools
+import logging
+import os
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pyrogram.errors import BadRequest
+
+try:
+    from PIL import Image
+except ImportError:  # resizing is optional
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Downloading thumbnails ourselves is opt-in; without it Telegram fetches the URLs.
+THUMBNAIL_PREFETCH = os.getenv("THUMBNAIL_PREFETCH", "0") == "1"
+THUMBNAIL_DIR = os.getenv("THUMBNAIL_DIR", "thumbnails")
+THUMBNAIL_WIDTH = 640
+FETCH_TIMEOUT = 5
+MAX_PREFETCHED = 200
+QUALITIES = ("maxresdefault", "hqdefault", "mqdefault")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS thumbnails (
+    video_id TEXT PRIMARY KEY,
+    file_id TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def thumbnail_urls(video_id):
+    return [f"https://img.youtube.com/vi/{video_id}/{quality}.jpg" for quality in QUALITIES]
+
+
+class ThumbnailCache:
+    # Telegram returns a file_id for every photo it stores; sending that id
+    # again is instant and never re-downloads from YouTube. The first send for
+    # a video walks maxres -> hq -> mq (maxres is missing for many videos), or
+    # uploads a locally pre-fetched and resized copy when one is ready.
+
+    def __init__(self, storage, directory=THUMBNAIL_DIR, prefetch_enabled=THUMBNAIL_PREFETCH):
+        self.storage = storage
+        self.directory = directory
+        self.prefetch_enabled = prefetch_enabled
+        self.file_ids = {}
+        self.fetches = {}
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbnail")
+        self.hits = 0
+        self.misses = 0
+
+    async def load(self):
+        await self.storage.executescript(SCHEMA)
+        self.file_ids = dict(await self.storage.fetchall("SELECT video_id, file_id FROM thumbnails"))
+        if self.prefetch_enabled:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _remember(self, video_id, file_id):
+        self.file_ids[video_id] = file_id
+        self.storage.execute_later(
+            "INSERT OR REPLACE INTO thumbnails (video_id, file_id, updated_at) VALUES (?, ?, ?)",
+            (video_id, file_id, time.time())
+        )
+
+    def _forget(self, video_id):
+        self.file_ids.pop(video_id, None)
+        self.storage.execute_later("DELETE FROM thumbnails WHERE video_id = ?", (video_id,))
+
+    # ✅ Background pre-fetch
+    def prefetch(self, video_id):
+        if not self.prefetch_enabled or not video_id or video_id in self.file_ids or video_id in self.fetches:
+            return
+        if len(self.fetches) >= MAX_PREFETCHED:
+            # Pre-fetched for tracks that never played: drop the oldest.
+            oldest = next((key for key, fetch in self.fetches.items() if fetch.done()), None)
+            if oldest is None:
+                return
+            self._discard(oldest)
+        loop = asyncio.get_running_loop()
+        self.fetches[video_id] = loop.run_in_executor(self.executor, self._download, video_id)
+
+    def _download(self, video_id):
+        path = os.path.join(self.directory, f"{video_id}.jpg")
+        for url in thumbnail_urls(video_id):
+            try:
+                with urllib.request.urlopen(url, timeout=FETCH_TIMEOUT) as response:
+                    data = response.read()
+                with open(path, "wb") as f:
+                    f.write(data)
+            except Exception:
+                continue  # 404 for missing qualities: try the next one
+            if Image is not None:
+                try:
+                    with Image.open(path) as image:
+                        if image.width > THUMBNAIL_WIDTH:
+                            height = round(image.height * THUMBNAIL_WIDTH / image.width)
+                            image.convert("RGB").resize((THUMBNAIL_WIDTH, height)).save(path, "JPEG", quality=85)
+                except Exception as e:
+                    logger.warning(f"⚠️ Thumbnail Resize Error ({video_id}): {e}")
+            return path
+        logger.warning(f"⚠️ No thumbnail found for {video_id}")
+        return None
+
+    def _prefetched(self, video_id):
+        fetch = self.fetches.get(video_id)
+        if fetch is None or not fetch.done() or fetch.cancelled() or fetch.exception():
+            return None
+        return fetch.result()
+
+    def _discard(self, video_id):
+        fetch = self.fetches.pop(video_id, None)
+        path = fetch.result() if fetch is not None and fetch.done() and not fetch.exception() else None
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    # ✅ Send
+    async def reply_photo(self, message, video_id, **kwargs):
+        # Returns the sent message, or None when no thumbnail source worked.
+        return await self._send(message.reply_photo, video_id, **kwargs)
+
+    async def send_photo(self, client, chat_id, video_id, **kwargs):
+        return await self._send(functools.partial(client.send_photo, chat_id), video_id, **kwargs)
+
+    async def _send(self, send, video_id, **kwargs):
+        file_id = self.file_ids.get(video_id)
+        if file_id:
+            try:
+                reply = await send(photo=file_id, **kwargs)
+                self.hits += 1
+                return reply
+            except BadRequest as e:
+                logger.warning(f"⚠️ Cached thumbnail rejected ({video_id}): {e}")
+                self._forget(video_id)
+        self.misses += 1
+
+        local = self._prefetched(video_id)
+        for photo in ([local] if local else []) + thumbnail_urls(video_id):
+            try:
+                reply = await send(photo=photo, **kwargs)
+            except BadRequest:
+                continue
+            photo_info = getattr(reply, "photo", None)
+            if photo_info is not None:
+                self._remember(video_id, photo_info.file_id)
+            self._discard(video_id)
+            return reply
+        self._discard(video_id)
+        return None
+
+    def stats(self):
+        return {"cached": len(self.file_ids), "hits": self.hits, "misses": self.misses,
+                "prefetching": sum(1 for fetch in self.fetches.values() if not fetch.done())}
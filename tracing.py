@@ -0,0 +1,192 @@
+# tracing.py
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+SLOW_TRACE_THRESHOLD = float(os.getenv("SLOW_TRACE_THRESHOLD", 5.0))
+STALL_THRESHOLD = float(os.getenv("STALL_THRESHOLD", 0.25))
+HEARTBEAT_INTERVAL = 0.05
+KEPT_TRACES = 50
+
+slow_traces = deque(maxlen=KEPT_TRACES)
+stalls = deque(maxlen=KEPT_TRACES)
+_current = contextvars.ContextVar("trace", default=None)
+# Nesting lives in the context, not on the Trace: tasks started below a span
+# get their own copy, so concurrent children never shift each other's depth.
+_depth = contextvars.ContextVar("span_depth", default=0)
+
+
+class Trace:
+    __slots__ = ("name", "started", "elapsed", "spans", "wall", "finished")
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.monotonic()
+        self.wall = time.time()
+        self.elapsed = 0.0
+        self.spans = []
+        self.finished = False
+
+    def ordered(self):
+        # Spans are appended as they finish; show them in the order they started.
+        return sorted(self.spans, key=lambda item: item[1])
+
+    def breakdown(self):
+        return ", ".join(
+            f"{'> ' * depth}{name}={duration * 1000:.0f}ms" for name, _, duration, depth in self.ordered()
+        )
+
+
+@contextmanager
+def trace(name):
+    # One trace per handler call; spans opened anywhere below it attach here.
+    current = Trace(name)
+    token = _current.set(current)
+    depth_token = _depth.set(0)
+    active, watchdog.active = watchdog.active, name
+    try:
+        yield current
+    finally:
+        watchdog.active = active
+        _current.reset(token)
+        _depth.reset(depth_token)
+        current.finished = True
+        current.elapsed = time.monotonic() - current.started
+        if current.elapsed >= SLOW_TRACE_THRESHOLD:
+            slow_traces.append(current)
+            logger.warning(f"🐢 Slow {name}: {current.elapsed * 1000:.0f}ms [{current.breakdown()}]")
+
+
+@contextmanager
+def span(name):
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    started = time.monotonic()
+    depth = _depth.get()
+    token = _depth.set(depth + 1)
+    active, watchdog.active = watchdog.active, f"{current.name} > {name}"
+    try:
+        yield
+    finally:
+        watchdog.active = active
+        _depth.reset(token)
+        # A task that outlived its request must not grow a trace already reported
+        if not current.finished:
+            current.spans.append((name, started - current.started, time.monotonic() - started, depth))
+
+
+def detached(coro):
+    # A task that is not part of the current request (shared lookups, background
+    # prefetches): it starts with no trace, so its spans land nowhere rather
+    # than on whichever request happened to create it.
+    context = contextvars.copy_context()
+    context.run(_current.set, None)
+    return context.run(asyncio.ensure_future, coro)
+
+
+def traced(name):
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class StallWatchdog:
+    # The loop bumps a heartbeat every HEARTBEAT_INTERVAL; a watcher thread
+    # notices when it stops, and grabs the loop thread's stack and running task
+    # while the stall is still happening. trace() and span() keep `active` on
+    # the span entered last, so a stall also names the request it happened in.
+
+    def __init__(self, threshold=STALL_THRESHOLD):
+        self.threshold = threshold
+        self.heartbeat = time.monotonic()
+        self.lag = 0.0  # how late the last heartbeat ran
+        self.active = None
+        self.loop_thread_id = None
+        self.thread = None
+        self.task = None
+
+    async def _beat(self):
+        while True:
+            now = time.monotonic()
+            self.lag = max(0.0, now - self.heartbeat - HEARTBEAT_INTERVAL)
+            self.heartbeat = now
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    @staticmethod
+    def _running_task(frame):
+        # The outermost coroutine on the loop thread's stack is the running task's.
+        name = "<no task>"
+        while frame is not None:
+            code = frame.f_code
+            if code.co_flags & inspect.CO_COROUTINE:
+                name = getattr(code, "co_qualname", code.co_name)
+            frame = frame.f_back
+        return name
+
+    def _watch(self):
+        stall = None
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            behind = time.monotonic() - self.heartbeat
+            if behind >= self.threshold and stall is None:
+                frame = sys._current_frames().get(self.loop_thread_id)
+                stall = {
+                    "at": time.time(),
+                    "task": self._running_task(frame),
+                    "span": self.active,
+                    "where": f"{frame.f_code.co_filename}:{frame.f_lineno} {frame.f_code.co_name}" if frame else "?",
+                    "stack": "".join(traceback.format_stack(frame, limit=8)) if frame else "",
+                    "duration": behind,
+                }
+            elif stall is not None:
+                if behind < self.threshold:
+                    stalls.append(stall)
+                    during = f" during {stall['span']}" if stall["span"] else ""
+                    logger.warning(f"🧊 Event loop stalled {stall['duration'] * 1000:.0f}ms in {stall['task']}{during} at {stall['where']}")
+                    stall = None
+                else:
+                    stall["duration"] = behind
+
+    def start(self):
+        self.loop_thread_id = threading.get_ident()
+        self.task = asyncio.create_task(self._beat())
+        self.thread = threading.Thread(target=self._watch, name="stall-watchdog", daemon=True)
+        self.thread.start()
+
+
+watchdog = StallWatchdog()
+
+
+def format_recent(limit=10):
+    lines = []
+    for item in list(slow_traces)[-limit:]:
+        lines.append(
+            f"🐢 `{item.name}` {item.elapsed * 1000:.0f}ms @ {time.strftime('%H:%M:%S', time.localtime(item.wall))}\n"
+            + "\n".join(
+                f"{'  ' * depth}▫️ {name}: {duration * 1000:.0f}ms (+{offset * 1000:.0f})"
+                for name, offset, duration, depth in item.ordered()
+            )
+        )
+    for item in list(stalls)[-limit:]:
+        lines.append(
+            f"🧊 Loop stall {item['duration'] * 1000:.0f}ms @ {time.strftime('%H:%M:%S', time.localtime(item['at']))} "
+            f"in `{item['task']}`" + (f" during `{item['span']}`" if item["span"] else "") + f"\n▫️ {item['where']}"
+        )
+    return "\n\n".join(lines)
@@ -0,0 +1,138 @@
+# voice_sessions.py
+import asyncio
+import logging
+from pytgcalls.types import StreamType
+from pytgcalls.exceptions import AlreadyJoinedError, NotInGroupCallError
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# ✅ Session States
+IDLE = "idle"
+JOINING = "joining"
+PLAYING = "playing"
+PAUSED = "paused"
+
+
+class VoiceSession:
+    __slots__ = ("chat_id", "state", "lock")
+
+    def __init__(self, chat_id):
+        self.chat_id = chat_id
+        self.state = IDLE
+        self.lock = asyncio.Lock()
+
+
+class VoiceSessionManager:
+    # One PyTgCalls instance, many group calls: every chat gets its own
+    # state and lock so a join/leave in one group never waits on another.
+
+    def __init__(self, call_py):
+        self.call_py = call_py
+        self.sessions = {}
+        self.active = set()
+
+    def session(self, chat_id):
+        session = self.sessions.get(chat_id)
+        if session is None:
+            session = self.sessions[chat_id] = VoiceSession(chat_id)
+        return session
+
+    def state(self, chat_id):
+        session = self.sessions.get(chat_id)
+        return session.state if session else IDLE
+
+    def is_active(self, chat_id):
+        return self.state(chat_id) != IDLE
+
+    def active_chats(self):
+        return list(self.active)
+
+    @property
+    def active_count(self):
+        return len(self.active)
+
+    def _set_state(self, session, state):
+        session.state = state
+        if state == IDLE:
+            self.active.discard(session.chat_id)
+        else:
+            self.active.add(session.chat_id)
+
+    @traced("join_group_call")
+    async def join(self, chat_id, stream):
+        # Returns True if this call joined the chat, False if it was already in a call.
+        session = self.session(chat_id)
+        async with session.lock:
+            if session.state != IDLE:
+                return False
+            self._set_state(session, JOINING)
+            try:
+                await self.call_py.join_group_call(
+                    chat_id,
+                    stream,
+                    stream_type=StreamType().pulse_stream
+                )
+            except AlreadyJoinedError:
+                logger.warning(f"⚠️ Already in call for {chat_id}, switching stream")
+                await self.call_py.change_stream(chat_id, stream)
+            except Exception:
+                self._set_state(session, IDLE)
+                raise
+            self._set_state(session, PLAYING)
+            return True
+
+    async def change(self, chat_id, stream):
+        session = self.session(chat_id)
+        async with session.lock:
+            if session.state == IDLE:
+                return False
+            await self.call_py.change_stream(chat_id, stream)
+            self._set_state(session, PLAYING)
+            return True
+
+    async def pause(self, chat_id):
+        session = self.session(chat_id)
+        async with session.lock:
+            if session.state != PLAYING:
+                return False
+            await self.call_py.pause_stream(chat_id)
+            self._set_state(session, PAUSED)
+            return True
+
+    async def resume(self, chat_id):
+        session = self.session(chat_id)
+        async with session.lock:
+            if session.state != PAUSED:
+                return False
+            await self.call_py.resume_stream(chat_id)
+            self._set_state(session, PLAYING)
+            return True
+
+    async def leave(self, chat_id):
+        session = self.sessions.get(chat_id)
+        if session is None:
+            return False
+        async with session.lock:
+            if session.state == IDLE:
+                return False
+            try:
+                await self.call_py.leave_group_call(chat_id)
+            except NotInGroupCallError:
+                pass
+            except Exception as e:
+                logger.error(f"❌ Leave Call Error ({chat_id}): {e}")
+            self._set_state(session, IDLE)
+            return True
+
+    async def played_time(self, chat_id):
+        # Seconds the current stream has been playing (None if not in a call).
+        if not self.is_active(chat_id):
+            return None
+        return await self.call_py.played_time(chat_id)
+
+    def mark_idle(self, chat_id):
+        # Used when pytgcalls reports that we were kicked or the call closed.
+        session = self.sessions.get(chat_id)
+        if session:
+            self._set_state(session, IDLE)